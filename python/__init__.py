@@ -0,0 +1,5 @@
+"""
+Example scripts as an importable package: importing any module here has no side effects (the demos run from main()).
+The modules import each other by their plain names, so they are also run directly as scripts from this folder,
+e.g. python recipient_mailbox.py. The Flask server below reaches the shared instrumentation layer through this package.
+"""
@@ -0,0 +1,366 @@
+""" crypto_benchmark.py
+Benchmarks the crypto building blocks of the scripts in this folder and tracks regressions against a JSON baseline.
+
+Covered:
+secure_file_messaging_with_certs.py          create_key_pair, create_certificate, CertificateAuthority.issue,
+                                             ChainValidator.validate (uncached and cached), encrypt_file/decrypt_file,
+                                             encrypt_symmetric_key (per recipient count), sign_file/verify_signature,
+                                             X25519 envelopes (wrap_envelope/unwrap_envelope)
+message_sign_and_verify_with_cert_EdDSA_and_ECDSA.py   Ed25519 and ECDSA (P-256, prehashed SHA-256) sign/verify
+permit_issuance_conditioned_by_counter.py    CA.sign_permit (Permit records and JSON dicts) and CA.verify_permit
+
+Every case is repeated until it has run for --min-time seconds, --repeat times, and the best round is reported as ops/s
+(and MB/s where a payload size applies).
+
+python crypto_benchmark.py --output results.json
+python crypto_benchmark.py --save-baseline baseline.json
+python crypto_benchmark.py --compare baseline.json --threshold 0.2   (exit code 1 if any case is >20% slower)
+python crypto_benchmark.py --envelopes 10 1000 100000   (RSA-OAEP per recipient vs the X25519 envelope)
+"""
+import argparse
+import base64
+import functools
+import hashlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import warnings
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, padding
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.asymmetric.utils import Prehashed
+from cryptography.utils import CryptographyDeprecationWarning
+
+if __package__:
+    from . import permit_issuance_conditioned_by_counter as permits
+    from . import secure_file_messaging_with_certs as messaging
+else:  # run as a script from this folder
+    import permit_issuance_conditioned_by_counter as permits
+    import secure_file_messaging_with_certs as messaging
+
+PAYLOAD_SIZES = [1 << 10, 64 << 10, 1 << 20, 16 << 20]
+SIGN_PAYLOAD_SIZES = [1 << 10, 1 << 20]
+RECIPIENT_COUNTS = [1, 10, 100]
+ENVELOPE_RECIPIENT_COUNTS = [10, 1_000, 100_000]
+
+
+def measure(operation, min_time, repeat):
+    """Return the best seconds per call of operation over repeat rounds of at least min_time seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        calls = 0
+        time_start = time.perf_counter()
+        while True:
+            operation()
+            calls += 1
+            elapsed = time.perf_counter() - time_start
+            if elapsed >= min_time:
+                break
+        best = min(best, elapsed / calls)
+    return best
+
+
+def benchmark_cases(workdir):
+    """
+    Yield (name, setup, bytes_per_call, calls_per_op) for every case. setup() prepares the case and returns the operation
+    to time, so a case skipped by --only costs nothing; keys and payloads shared by several cases are built once.
+    """
+    symmetric_key = os.urandom(32)
+
+    @functools.cache
+    def rsa():
+        key = messaging.create_key_pair()
+        return key, messaging.create_certificate(key, "User 1", "User 1").public_key()
+
+    @functools.cache
+    def authority():
+        key, _ = rsa()
+        ca = messaging.CertificateAuthority.root().intermediate("Users CA")
+        return ca, ca.issue(key, "User 1", "User 1")
+
+    @functools.cache
+    def payload(size):
+        path = os.path.join(workdir, f"payload_{size}")
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        return path
+
+    @functools.cache
+    def x25519():
+        key = messaging.create_x25519_key_pair()
+        return key, key.public_key()
+
+    def create_certificate():
+        key, _ = rsa()
+        return lambda: messaging.create_certificate(key, "User 1", "User 1")
+
+    def ca_issue_certificate():
+        key, _ = rsa()
+        ca, _ = authority()
+        return lambda: ca.issue(key, "User 1", "User 1")
+
+    def validate_chain():
+        ca, issued = authority()
+        # A fresh validator per call checks the whole chain (leaf and intermediate signatures)
+        return lambda: messaging.ChainValidator([ca.root_certificate()], ca.chain()).validate(issued)
+
+    def validate_chain_cached():
+        ca, issued = authority()
+        validator = messaging.ChainValidator([ca.root_certificate()], ca.chain())
+        return lambda: validator.validate(issued)
+
+    yield 'rsa2048_keygen', lambda: messaging.create_key_pair, None, 1
+    yield 'create_certificate', create_certificate, None, 1
+    yield 'ca_issue_certificate', ca_issue_certificate, None, 1
+    yield 'validate_chain', validate_chain, None, 1
+    yield 'validate_chain_cached', validate_chain_cached, None, 1
+
+    for size in PAYLOAD_SIZES:
+        def encrypt_file(size=size):
+            path = payload(size)
+            return lambda: messaging.encrypt_file(path, symmetric_key)
+
+        def decrypt_file(size=size):
+            ciphertext = messaging.encrypt_file(payload(size), symmetric_key)
+            return lambda: messaging.decrypt_file(ciphertext, symmetric_key)
+
+        yield f'encrypt_file[{size}]', encrypt_file, size, 1
+        yield f'decrypt_file[{size}]', decrypt_file, size, 1
+
+    for recipients in RECIPIENT_COUNTS:
+        def encrypt_symmetric_key(recipients=recipients):
+            _, public_key = rsa()
+            return lambda: [messaging.encrypt_symmetric_key(symmetric_key, public_key) for _ in range(recipients)]
+
+        yield f'encrypt_symmetric_key[recipients={recipients}]', encrypt_symmetric_key, None, recipients
+
+    def rsa_oaep_unwrap():
+        key, public_key = rsa()
+        oaep = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+        wrapped_key = messaging.encrypt_symmetric_key(symmetric_key, public_key)
+        return lambda: key.decrypt(wrapped_key, oaep)
+
+    yield 'rsa_oaep_unwrap', rsa_oaep_unwrap, None, 1
+
+    yield 'x25519_keygen', lambda: messaging.create_x25519_key_pair, None, 1
+    for recipients in RECIPIENT_COUNTS:
+        def wrap_envelope(recipients=recipients):
+            _, x25519_public = x25519()
+            return lambda: messaging.wrap_envelope(symmetric_key, [x25519_public] * recipients)
+
+        yield f'wrap_envelope[recipients={recipients}]', wrap_envelope, None, recipients
+
+    def unwrap_envelope():
+        x25519_key, x25519_public = x25519()
+        envelope = messaging.wrap_envelope(symmetric_key, [x25519_public])
+        return lambda: messaging.unwrap_envelope(envelope, 0, x25519_key)
+
+    yield 'unwrap_envelope', unwrap_envelope, None, 1
+
+    for size in SIGN_PAYLOAD_SIZES:
+        def sign_file(size=size):
+            key, _ = rsa()
+            path = payload(size)
+            return lambda: messaging.sign_file(path, key)
+
+        def verify_signature(size=size):
+            key, public_key = rsa()
+            path = payload(size)
+            signature = messaging.sign_file(path, key)
+            return lambda: messaging.verify_signature(path, signature, public_key)
+
+        yield f'sign_file[{size}]', sign_file, size, 1
+        yield f'verify_signature[{size}]', verify_signature, size, 1
+
+    message = b"Hello, EdDSA!"
+
+    def ed25519_sign():
+        ed_key = Ed25519PrivateKey.generate()
+        return lambda: ed_key.sign(message)
+
+    def ed25519_verify():
+        ed_key = Ed25519PrivateKey.generate()
+        ed_public = ed_key.public_key()
+        ed_signature = ed_key.sign(message)
+        return lambda: ed_public.verify(ed_signature, message)
+
+    yield 'ed25519_sign', ed25519_sign, None, 1
+    yield 'ed25519_verify', ed25519_verify, None, 1
+
+    prehashed = ec.ECDSA(Prehashed(hashes.SHA256()))
+    digest = hashlib.sha256(b"Hello, ECDSA!").digest()
+
+    def ecdsa_p256_sign():
+        ec_key = ec.generate_private_key(ec.SECP256R1())
+        return lambda: ec_key.sign(digest, prehashed)
+
+    def ecdsa_p256_verify():
+        ec_key = ec.generate_private_key(ec.SECP256R1())
+        ec_public = ec_key.public_key()
+        ec_signature = ec_key.sign(digest, prehashed)
+        return lambda: ec_public.verify(ec_signature, digest, prehashed)
+
+    yield 'ecdsa_p256_sign', ecdsa_p256_sign, None, 1
+    yield 'ecdsa_p256_verify', ecdsa_p256_verify, None, 1
+
+    @functools.cache
+    def permit_ca():
+        return permits.CA(max_accumulated=10, delay=None)
+
+    def permit_sign():
+        ca = permit_ca()
+        return lambda: ca.sign_permit(permits.Permit('A', 5))
+
+    def permit_sign_json():
+        ca = permit_ca()
+        return lambda: ca.sign_permit({'recipient': 'A', 'counter': 5})
+
+    def permit_validate():
+        ca = permit_ca()
+        permit = ca.sign_permit(permits.Permit('A', 5))
+        return lambda: ca.verify_permit(permit)
+
+    yield 'permit_sign', permit_sign, None, 1
+    yield 'permit_sign_json', permit_sign_json, None, 1
+    yield 'permit_validate', permit_validate, None, 1
+
+
+def run(min_time=0.2, repeat=3, only=None):
+    results = {}
+    # encrypt_file/decrypt_file use AES-CFB, which newer cryptography releases warn about on every call
+    warnings.simplefilter('ignore', CryptographyDeprecationWarning)
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, setup, size, calls_per_op in benchmark_cases(workdir):
+            if only and only not in name:
+                continue
+            seconds = measure(setup(), min_time, repeat)
+            result = {'seconds_per_call': seconds, 'ops_per_second': calls_per_op / seconds}
+            if size:
+                result['mb_per_second'] = size / seconds / (1 << 20)
+            results[name] = result
+            rate = f"{result['ops_per_second']:>14,.1f} ops/s"
+            if size:
+                rate += f" {result['mb_per_second']:>10,.1f} MB/s"
+            print(f"{name:45} {rate}")
+    return results
+
+
+def envelope_comparison(recipient_counts, key_pool=16, unwrap_samples=200):
+    """
+    Wrap one AES key for n recipients with RSA-OAEP (encrypt_symmetric_key per recipient) and with the X25519 envelope,
+    then time single-recipient unwraps. Recipients cycle through key_pool key pairs per scheme: the cost of a wrap
+    does not depend on which key is used, and 100k RSA key pairs would take hours to generate.
+    """
+    oaep = padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA256()), algorithm=hashes.SHA256(), label=None)
+    symmetric_key = os.urandom(32)
+
+    time_start = time.perf_counter()
+    rsa_keys = [messaging.create_key_pair() for _ in range(key_pool)]
+    rsa_keygen = (time.perf_counter() - time_start) / key_pool
+    time_start = time.perf_counter()
+    x25519_keys = [messaging.create_x25519_key_pair() for _ in range(key_pool)]
+    x25519_keygen = (time.perf_counter() - time_start) / key_pool
+    rsa_public = [key.public_key() for key in rsa_keys]
+    x25519_public = [key.public_key() for key in x25519_keys]
+
+    results = {'key_pool': key_pool, 'rsa_keygen_ms': rsa_keygen * 1000, 'x25519_keygen_ms': x25519_keygen * 1000}
+    print(f"Key generation: RSA-2048 {rsa_keygen * 1000:.1f} ms, X25519 {x25519_keygen * 1000:.3f} ms")
+    print(f"{'recipients':>10}  {'scheme':8} {'wrap s':>9} {'unwrap ms':>10} {'bytes':>11} {'JSON bytes':>11}")
+    for n in recipient_counts:
+        time_start = time.perf_counter()
+        wrapped = [messaging.encrypt_symmetric_key(symmetric_key, rsa_public[i % key_pool]) for i in range(n)]
+        rsa_wrap = time.perf_counter() - time_start
+        time_start = time.perf_counter()
+        envelope = messaging.wrap_envelope(symmetric_key, [x25519_public[i % key_pool] for i in range(n)])
+        x25519_wrap = time.perf_counter() - time_start
+
+        samples = range(0, n, max(1, n // unwrap_samples))
+        time_start = time.perf_counter()
+        for i in samples:
+            assert rsa_keys[i % key_pool].decrypt(wrapped[i], oaep) == symmetric_key
+        rsa_unwrap = (time.perf_counter() - time_start) / len(samples)
+        time_start = time.perf_counter()
+        for i in samples:
+            assert messaging.unwrap_envelope(envelope, i, x25519_keys[i % key_pool]) == symmetric_key
+        x25519_unwrap = (time.perf_counter() - time_start) / len(samples)
+
+        rsa_bytes = sum(len(w) for w in wrapped)
+        rsa_json = sum(len(w.hex()) for w in wrapped)  # hex strings, as in create_json_structure
+        x25519_json = len(base64.b64encode(envelope))
+        results[str(n)] = {
+            'rsa': {'wrap_seconds': rsa_wrap, 'unwrap_ms': rsa_unwrap * 1000, 'bytes': rsa_bytes, 'json_bytes': rsa_json},
+            'x25519': {'wrap_seconds': x25519_wrap, 'unwrap_ms': x25519_unwrap * 1000, 'bytes': len(envelope),
+                       'json_bytes': x25519_json},
+        }
+        for scheme, wrap, unwrap, size, json_size in (('RSA-OAEP', rsa_wrap, rsa_unwrap, rsa_bytes, rsa_json),
+                                                      ('X25519', x25519_wrap, x25519_unwrap, len(envelope), x25519_json)):
+            print(f"{n:>10,}  {scheme:8} {wrap:>9.3f} {unwrap * 1000:>10.3f} {size:>11,} {json_size:>11,}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Return the cases whose ops/s dropped by more than threshold (a fraction) from the baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['ops_per_second']
+        change = result['ops_per_second'] / before - 1
+        if change < -threshold:
+            regressions.append((name, before, result['ops_per_second'], change))
+    return regressions
+
+
+def environment():
+    import cryptography
+    return {'python': sys.version.split()[0], 'cryptography': cryptography.__version__,
+            'machine': platform.machine(), 'platform': platform.platform()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-time', type=float, default=0.2, help="Seconds per round")
+    parser.add_argument('--repeat', type=int, default=3, help="Rounds per case; the best is kept")
+    parser.add_argument('--only', help="Run only cases whose name contains this text")
+    parser.add_argument('--output', help="Write results to this JSON file")
+    parser.add_argument('--save-baseline', help="Write results as the baseline JSON file")
+    parser.add_argument('--compare', help="Baseline JSON file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before a case is flagged")
+    parser.add_argument('--envelopes', type=int, nargs='*', metavar='N',
+                        help=f"Only compare RSA-OAEP and X25519 envelopes for N recipients (default {ENVELOPE_RECIPIENT_COUNTS})")
+    args = parser.parse_args()
+
+    if args.envelopes is not None:
+        document = {'environment': environment(),
+                    'envelopes': envelope_comparison(args.envelopes or ENVELOPE_RECIPIENT_COUNTS)}
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(document, f, indent=4)
+        return
+
+    results = run(args.min_time, args.repeat, args.only)
+    document = {'environment': environment(), 'results': results}
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(document, f, indent=4)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if baseline.get('environment') != document['environment']:
+            print("Note: baseline was recorded in a different environment:", baseline.get('environment'))
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:,.1f} -> {after:,.1f} ops/s ({change:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,17 @@
 # Examples: Generate fake profiles for testing
-def variable_name_to_text (variable):
-    for name, value in globals().items():
-        if id(value) == id(variable):
-            return name
-    return None
-def display_results(variable):
-    print(f"{variable_name_to_text (variable)} = {variable}")
+"""
+Importing this module has no side effects: the examples below are functions, run from the command line with
+python data_generation_test_synthetic_profile.py [sample batch writer sharded faker_cache]   (all when none are given)
+NumPy, Faker and dateutil are imported on first use, so importing only the writer/reader helpers stays cheap.
+"""
+import datetime
+import functools
+import random
+import time
+
+
+def display_results(name, value):
+    print(f"{name} = {value}")
 
 
 def generate_random_integer(bound_upper, bound_lower):
@@ -18,64 +24,71 @@ def generate_random_float(bound_upper, bound_lower):
     return random.uniform(bound_lower, bound_upper)
 
 
-import datetime
-import random
-from dateutil.relativedelta import relativedelta
-
 # [Sample Usage]
-# Generate a random date
-year = random.randint(2000, 2023)
-month = random.randint(1, 12)
-day = random.randint(1, 28)
-date = datetime.date(year, month, day)
-duration_hours = random.randint(1, 24)
-time_start = datetime.datetime.now()
-time_end = time_start + datetime.timedelta(hours=duration_hours)
-# Define the start and end dates
-start_date = datetime.date(2020, 1, 1)
-end_date = datetime.date(2023, 4, 15)
-
-# Calculate the time delta in years and months
-delta = relativedelta(end_date, start_date)
-years = delta.years
-months = delta.months
-end_date = start_date + relativedelta(months=6, years=2)
-
-print("Start date:", start_date)
-print("End date:", end_date)
-print("Time elapsed: {} years and {} months".format(years, months))
-print("Start time:", time_start)
-print("End time:", time_end)
-print("Duration (in hours):", duration_hours)
-#print("Time elapsed:", time_elapsed)
-
-#!pip install faker
-from faker import Faker
-fake = Faker() # create a Faker object
-
-name = fake.name()
-address = fake.address() # generate a random address
-country_code = fake.country_code(representation="alpha-3") # generate a random country code in ISO 3166-1 alpha-3 format
-phone_number = fake.phone_number() # generate a random phone number
-credit_card_number = fake.credit_card_number()
-company = fake.company()
-job = fake.job()
-profile = [name, address, country_code, phone_number, credit_card_number, company, job]
-
-for i in range(len(profile)):
-    display_results(globals()[variable_name_to_text(profile[i])])
-
-age = generate_random_integer(bound_upper = 124, bound_lower = 0)
-weight_in_kgs = generate_random_integer(bound_upper = 100, bound_lower = 2)
-profile = [age, weight_in_kgs]
-
-username = fake.user_name()
-random_word = fake.word()
-random_sentence = fake.sentence()
-profile = [username, random_word, random_sentence]
-
-for i in range(len(profile)):
-    display_results(globals()[variable_name_to_text(profile[i])])
+def demo_sample():
+    from dateutil.relativedelta import relativedelta
+    #!pip install faker
+    from faker import Faker
+
+    # Generate a random date
+    year = random.randint(2000, 2023)
+    month = random.randint(1, 12)
+    day = random.randint(1, 28)
+    date = datetime.date(year, month, day)
+    duration_hours = random.randint(1, 24)
+    time_start = datetime.datetime.now()
+    time_end = time_start + datetime.timedelta(hours=duration_hours)
+    # Define the start and end dates
+    start_date = datetime.date(2020, 1, 1)
+    end_date = datetime.date(2023, 4, 15)
+
+    # Calculate the time delta in years and months
+    delta = relativedelta(end_date, start_date)
+    years = delta.years
+    months = delta.months
+    end_date = start_date + relativedelta(months=6, years=2)
+
+    print("Start date:", start_date)
+    print("End date:", end_date)
+    print("Time elapsed: {} years and {} months".format(years, months))
+    print("Start time:", time_start)
+    print("End time:", time_end)
+    print("Duration (in hours):", duration_hours)
+    #print("Time elapsed:", time_elapsed)
+
+    fake = Faker() # create a Faker object
+
+    name = fake.name()
+    address = fake.address() # generate a random address
+    country_code = fake.country_code(representation="alpha-3") # generate a random country code in ISO 3166-1 alpha-3 format
+    phone_number = fake.phone_number() # generate a random phone number
+    credit_card_number = fake.credit_card_number()
+    company = fake.company()
+    job = fake.job()
+    profile = {
+        'name': name,
+        'address': address,
+        'country_code': country_code,
+        'phone_number': phone_number,
+        'credit_card_number': credit_card_number,
+        'company': company,
+        'job': job,
+    }
+
+    for field, value in profile.items():
+        display_results(field, value)
+
+    age = generate_random_integer(bound_upper = 124, bound_lower = 0)
+    weight_in_kgs = generate_random_integer(bound_upper = 100, bound_lower = 2)
+    profile = {'age': age, 'weight_in_kgs': weight_in_kgs}
+
+    username = fake.user_name()
+    random_word = fake.word()
+    random_sentence = fake.sentence()
+    profile = {'username': username, 'random_word': random_word, 'random_sentence': random_sentence}
+
+    for field, value in profile.items():
+        display_results(field, value)
 """
 Start date: 2020-01-01
 End date: 2022-07-01
@@ -98,4 +111,619 @@ random_sentence = Look environmental quite meet cause society.
 """ This can be written to a csv file (or format to json) as:
 id;date;age;age_range;sex;job_title;marital_status;education;height;weight;location;BMI;health_record;opt-in;
 m00001;20160919;19;18-29;female;student;unmarried;masters;155;43;USA;h89802289;yes;
-"""
\ No newline at end of file
+"""
+# High-throughput batch generation
+"""
+ProfileGenerator produces profiles for the schema above in column batches instead of one record at a time.
+Numeric columns (age, weight, height, BMI, ...) are drawn with NumPy in one call per batch.
+Faker is only called to fill a FakerValuePool per text field; each batch then picks from the pools with a single indexed draw.
+"""
+# field -> (Faker method, keyword arguments)
+FAKER_FIELDS = {
+    'name': ('name', {}),
+    'address': ('address', {}),
+    'location': ('country_code', {'representation': 'alpha-3'}),
+    'phone_number': ('phone_number', {}),
+    'credit_card_number': ('credit_card_number', {}),
+    'company': ('company', {}),
+    'job_title': ('job', {}),
+    'username': ('user_name', {}),
+    'word': ('word', {}),
+    'sentence': ('sentence', {}),
+}
+
+AGE_RANGE_BOUNDS = (18, 30, 45, 65)
+AGE_RANGE_LABELS = ('0-17', '18-29', '30-44', '45-64', '65+')
+SEX_LABELS = ('female', 'male')
+MARITAL_STATUS_LABELS = ('unmarried', 'married', 'divorced', 'widowed')
+EDUCATION_LABELS = ('none', 'primary', 'secondary', 'bachelors', 'masters', 'doctorate')
+
+DATE_START = '2000-01-01'
+DATE_END = '2023-12-31'
+
+
+@functools.cache
+def label_array(labels):
+    """labels as a NumPy object array, to pick labels for a whole column with one indexing operation."""
+    import numpy as np
+    return np.array(labels, dtype=object)
+
+
+class FakerValuePool:
+    """
+    Pre-generated values of one Faker provider, drawn with an indexed random pick instead of a provider call.
+    After every refresh_interval drawn values, refresh_fraction of the slots (chosen at random) are evicted and regenerated,
+    so long runs keep getting new values. refresh_interval=None keeps the pool fixed.
+    """
+    def __init__(self, fake, method, kwargs=None, size=10_000, refresh_interval=1_000_000, refresh_fraction=0.1, rng=None):
+        import numpy as np
+
+        self.provider = getattr(fake, method)
+        self.kwargs = kwargs or {}
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.refresh_fraction = refresh_fraction
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.values = np.array([self.provider(**self.kwargs) for _ in range(size)], dtype=object)
+        self.indices = []
+        self.drawn = 0
+        self.refreshes = 0
+
+    def refresh(self):
+        slots = self.rng.choice(self.size, max(1, int(self.size * self.refresh_fraction)), replace=False)
+        for slot in slots:
+            self.values[slot] = self.provider(**self.kwargs)
+        self.refreshes += 1
+
+    def _count(self, n):
+        self.drawn += n
+        if self.refresh_interval and self.drawn >= (self.refreshes + 1) * self.refresh_interval:
+            self.refresh()
+
+    def draw(self, n):
+        """Return n values as an object array."""
+        values = self.values[self.rng.integers(0, self.size, n)]
+        self._count(n)
+        return values
+
+    def draw_one(self):
+        # Indices are drawn in blocks; a scalar NumPy draw per value would cost more than the lookup itself
+        if not self.indices:
+            self.indices = self.rng.integers(0, self.size, 4096).tolist()
+        value = self.values[self.indices.pop()]
+        self._count(1)
+        return value
+
+
+class FakerCache:
+    """
+    Drop-in stand-in for a Faker object: cache.address() returns a value from a FakerValuePool
+    that is built on first use for each (provider, keyword arguments) pair.
+    """
+    def __init__(self, fake, size=10_000, refresh_interval=1_000_000, refresh_fraction=0.1, rng=None):
+        import numpy as np
+
+        self.fake = fake
+        self.size = size
+        self.refresh_interval = refresh_interval
+        self.refresh_fraction = refresh_fraction
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.pools = {}
+
+    def pool(self, method, **kwargs):
+        key = (method, tuple(sorted(kwargs.items())))
+        if key not in self.pools:
+            self.pools[key] = FakerValuePool(self.fake, method, kwargs, self.size, self.refresh_interval,
+                                             self.refresh_fraction, self.rng)
+        return self.pools[key]
+
+    def __getattr__(self, method):
+        def draw_one(**kwargs):
+            return self.pool(method, **kwargs).draw_one()
+        self.__dict__[method] = draw_one
+        return draw_one
+
+
+class ProfileGenerator:
+    def __init__(self, seed=None, pool_size=10_000, batch_size=100_000, locale=None,
+                 refresh_interval=1_000_000, refresh_fraction=0.1):
+        import numpy as np
+        from faker import Faker
+
+        self.rng = np.random.default_rng(seed)
+        self.fake = Faker(locale)
+        if seed is not None:
+            self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.next_id = 1
+        self.cache = FakerCache(self.fake, pool_size, refresh_interval, refresh_fraction, self.rng)
+        self.pools = {field: self.cache.pool(method, **kwargs) for field, (method, kwargs) in FAKER_FIELDS.items()}
+
+    def generate_batch(self, n):
+        """Return n profiles as a dict of equal-length columns."""
+        import numpy as np
+
+        rng = self.rng
+        ids = np.arange(self.next_id, self.next_id + n)
+        self.next_id += n
+
+        age = rng.integers(0, 125, n)
+        weight = rng.integers(2, 101, n)
+        height = np.clip(rng.normal(165, 12, n), 50, 210).astype(np.int64)
+        bmi = np.round(weight / (height / 100) ** 2, 1)
+        date_start = np.datetime64(DATE_START)
+        days = (np.datetime64(DATE_END) - date_start).astype(np.int64)
+
+        batch = {
+            'id': ids,
+            'date': date_start + rng.integers(0, days + 1, n).astype('timedelta64[D]'),
+            'age': age,
+            'age_range': label_array(AGE_RANGE_LABELS)[np.searchsorted(AGE_RANGE_BOUNDS, age, side='right')],
+            'sex': label_array(SEX_LABELS)[rng.integers(0, len(SEX_LABELS), n)],
+            'marital_status': label_array(MARITAL_STATUS_LABELS)[rng.integers(0, len(MARITAL_STATUS_LABELS), n)],
+            'education': label_array(EDUCATION_LABELS)[rng.integers(0, len(EDUCATION_LABELS), n)],
+            'height': height,
+            'weight': weight,
+            'BMI': bmi,
+            'health_record': rng.integers(0, 10**8, n),
+            'opt_in': rng.random(n) < 0.5,
+        }
+        for field, pool in self.pools.items():
+            batch[field] = pool.draw(n)
+        return batch
+
+    def generate(self, n):
+        """Yield batches of at most batch_size profiles until n profiles have been produced."""
+        remaining = n
+        while remaining > 0:
+            size = min(self.batch_size, remaining)
+            yield self.generate_batch(size)
+            remaining -= size
+
+
+# Usage
+def demo_batch(number_of_profiles=1_000_000):
+    time_pool_start = time.perf_counter()
+    generator = ProfileGenerator(seed=42)
+    time_pool_end = time.perf_counter()
+
+    time_generate_start = time.perf_counter()
+    generated = sum(len(batch['id']) for batch in generator.generate(number_of_profiles))
+    time_generate_end = time.perf_counter()
+
+    print(f"Value pools built in {time_pool_end - time_pool_start:.2f} s")
+    print(f"Generated {generated} profiles in {time_generate_end - time_generate_start:.2f} s "
+          f"({generated / (time_generate_end - time_generate_start):,.0f} profiles/s)")
+
+    sample = generator.generate_batch(1)
+    for field, column in sample.items():
+        display_results(field, column[0])
+"""
+Value pools built in 7.76 s
+Generated 1000000 profiles in 1.33 s (750,654 profiles/s)
+id = 1000001
+date = 2004-05-01
+age = 3
+age_range = 0-17
+sex = female
+marital_status = divorced
+education = secondary
+height = 197
+weight = 78
+BMI = 20.1
+health_record = 18230755
+opt_in = True
+name = Richard Beasley
+address = 82111 Phillip Route
+North Teresa, NY 10820
+location = KIR
+phone_number = 283.452.4843
+credit_card_number = 348858181317159
+company = Jennings Ltd
+job_title = Industrial buyer
+username = zbailey
+word = interview
+sentence = Bed after field plan nice night that fight.
+"""
+
+# Streaming writer for the profile schema
+"""
+ProfileWriter streams batches from ProfileGenerator.generate() to disk, so the full dataset never sits in memory.
+mode='csv'      ;-separated lines as documented above (header written once, when header=True)
+mode='jsonl'    one JSON object per line with the schema field names
+mode='columnar' typed binary column blocks, one self-describing block per batch:
+                b'PRFB' | uint32 rows | column 1 | column 2 | ...
+                numeric and categorical columns are raw little-endian arrays; text columns are uint32 offsets followed by UTF-8 bytes
+compression=None, 'gzip' or 'zstd' (zstd needs the zstandard package).
+Blocks, gzip members and zstd frames can all be concatenated, so shard files of any mode can be joined byte-for-byte.
+"""
+import gzip
+import io
+import json
+import os
+import struct
+
+PROFILE_SCHEMA = ['id', 'date', 'age', 'age_range', 'sex', 'job_title', 'marital_status', 'education',
+                  'height', 'weight', 'location', 'BMI', 'health_record', 'opt-in']
+
+
+def format_profile_columns(batch):
+    import numpy as np
+
+    columns = [
+        [f"m{i:08d}" for i in batch['id'].tolist()],
+        np.datetime_as_string(batch['date']).tolist(),
+        batch['age'].tolist(),
+        batch['age_range'].tolist(),
+        batch['sex'].tolist(),
+        batch['job_title'].tolist(),
+        batch['marital_status'].tolist(),
+        batch['education'].tolist(),
+        batch['height'].tolist(),
+        batch['weight'].tolist(),
+        batch['location'].tolist(),
+        batch['BMI'].tolist(),
+        [f"h{h:08d}" for h in batch['health_record'].tolist()],
+        ['yes' if o else 'no' for o in batch['opt_in'].tolist()],
+    ]
+    columns[1] = [d.replace('-', '') for d in columns[1]]
+    return columns
+
+
+def format_profile_lines(batch):
+    return ''.join(';'.join(map(str, row)) + ';\n' for row in zip(*format_profile_columns(batch)))
+
+
+COLUMNAR_BLOCK_MAGIC = b'PRFB'
+
+CATEGORICAL_COLUMNS = {
+    'age_range': AGE_RANGE_LABELS,
+    'sex': SEX_LABELS,
+    'marital_status': MARITAL_STATUS_LABELS,
+    'education': EDUCATION_LABELS,
+}
+
+# schema field -> (batch key, column type)
+COLUMNAR_LAYOUT = [
+    ('id', 'id', '<u8'),
+    ('date', 'date', '<i4'),
+    ('age', 'age', 'u1'),
+    ('age_range', 'age_range', 'category'),
+    ('sex', 'sex', 'category'),
+    ('job_title', 'job_title', 'text'),
+    ('marital_status', 'marital_status', 'category'),
+    ('education', 'education', 'category'),
+    ('height', 'height', '<u2'),
+    ('weight', 'weight', '<u2'),
+    ('location', 'location', 'text'),
+    ('BMI', 'BMI', '<f4'),
+    ('health_record', 'health_record', '<u4'),
+    ('opt-in', 'opt_in', 'u1'),
+]
+
+
+def open_output(path, compression=None):
+    if compression is None:
+        return open(path, 'wb')
+    if compression == 'gzip':
+        # No file name or modification time in the member header, so the output is byte-identical for a given seed
+        raw = open(path, 'wb')
+        output = gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=6, mtime=0)
+        output.myfileobj = raw  # closed with output, as when GzipFile opens the file itself
+        return output
+    if compression == 'zstd':
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'))
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def open_input(path, compression=None):
+    if compression is None:
+        return open(path, 'rb')
+    if compression == 'gzip':
+        return gzip.open(path, 'rb')
+    if compression == 'zstd':
+        import zstandard
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True))
+    raise ValueError(f"Unsupported compression: {compression}")
+
+
+def format_profile_records(batch):
+    lines = []
+    for row in zip(*format_profile_columns(batch)):
+        record = dict(zip(PROFILE_SCHEMA, row))
+        record['opt-in'] = record['opt-in'] == 'yes'
+        lines.append(json.dumps(record, separators=(',', ':')))
+    return '\n'.join(lines) + '\n'
+
+
+def encode_columnar_block(batch):
+    import numpy as np
+
+    n = len(batch['id'])
+    parts = [COLUMNAR_BLOCK_MAGIC, struct.pack('<I', n)]
+    for _, key, column_type in COLUMNAR_LAYOUT:
+        column = batch[key]
+        if column_type == 'category':
+            codes = {label: code for code, label in enumerate(CATEGORICAL_COLUMNS[key])}
+            parts.append(np.fromiter((codes[v] for v in column), dtype='u1', count=n).tobytes())
+        elif column_type == 'text':
+            encoded = [v.encode() for v in column]
+            offsets = np.zeros(n + 1, dtype='<u4')
+            np.cumsum([len(e) for e in encoded], out=offsets[1:])
+            parts.append(offsets.tobytes())
+            parts.append(b''.join(encoded))
+        elif key == 'date':
+            parts.append(column.astype('datetime64[D]').astype('<i4').tobytes())
+        else:
+            parts.append(column.astype(column_type).tobytes())
+    return b''.join(parts)
+
+
+def read_columnar(path, compression=None):
+    """Yield the batches of a columnar file as dicts of NumPy columns keyed by schema field."""
+    import numpy as np
+
+    with open_input(path, compression) as f:
+        while True:
+            head = f.read(8)
+            if not head:
+                return
+            if head[:4] != COLUMNAR_BLOCK_MAGIC:
+                raise ValueError("Not a profile columnar block")
+            n = struct.unpack('<I', head[4:])[0]
+            batch = {}
+            for field, key, column_type in COLUMNAR_LAYOUT:
+                if column_type == 'category':
+                    batch[field] = label_array(CATEGORICAL_COLUMNS[key])[np.frombuffer(f.read(n), dtype='u1')]
+                elif column_type == 'text':
+                    offsets = np.frombuffer(f.read(4 * (n + 1)), dtype='<u4')
+                    blob = f.read(int(offsets[-1]))
+                    batch[field] = np.array([blob[offsets[i]:offsets[i + 1]].decode() for i in range(n)], dtype=object)
+                else:
+                    dtype = np.dtype(column_type)
+                    batch[field] = np.frombuffer(f.read(n * dtype.itemsize), dtype=dtype)
+            batch['date'] = batch['date'].astype('datetime64[D]')
+            yield batch
+
+
+class ProfileWriter:
+    def __init__(self, path, mode='csv', compression=None, header=True):
+        if mode not in ('csv', 'jsonl', 'columnar'):
+            raise ValueError(f"Unsupported mode: {mode}")
+        self.mode = mode
+        self.file = open_output(path, compression)
+        self.rows = 0
+        if mode == 'csv' and header:
+            self.file.write((';'.join(PROFILE_SCHEMA) + ';\n').encode())
+
+    def write_batch(self, batch):
+        if self.mode == 'csv':
+            self.file.write(format_profile_lines(batch).encode())
+        elif self.mode == 'jsonl':
+            self.file.write(format_profile_records(batch).encode())
+        else:
+            self.file.write(encode_columnar_block(batch))
+        self.rows += len(batch['id'])
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_profiles(batches, path, mode='csv', compression=None, header=True):
+    """Stream an iterable of batches to path and return the number of rows written."""
+    with ProfileWriter(path, mode, compression, header) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    return writer.rows
+
+
+# Usage
+def demo_writer():
+    generator = ProfileGenerator(seed=7, pool_size=2_000)
+    for mode, compression, path in [
+        ('csv', None, 'profiles.csv'),
+        ('csv', 'gzip', 'profiles.csv.gz'),
+        ('jsonl', 'zstd', 'profiles.jsonl.zst'),
+        ('columnar', None, 'profiles.prf'),
+        ('columnar', 'zstd', 'profiles.prf.zst'),
+    ]:
+        time_start = time.perf_counter()
+        rows = write_profiles(generator.generate(500_000), path, mode, compression)
+        time_end = time.perf_counter()
+        print(f"{mode:8} {str(compression):5} {rows} rows in {time_end - time_start:.2f} s, "
+              f"{os.path.getsize(path) / rows:.1f} bytes/row")
+
+    read_back = sum(len(batch['id']) for batch in read_columnar('profiles.prf.zst', 'zstd'))
+    print(f"Read back {read_back} rows from profiles.prf.zst")
+
+"""
+csv      None  500000 rows in 2.56 s, 102.0 bytes/row
+csv      gzip  500000 rows in 5.02 s, 30.1 bytes/row
+jsonl    zstd  500000 rows in 6.98 s, 37.3 bytes/row
+columnar None  500000 rows in 0.47 s, 61.6 bytes/row
+columnar zstd  500000 rows in 0.64 s, 23.6 bytes/row
+Read back 500000 rows from profiles.prf.zst
+"""
+
+# Parallel, deterministic, sharded generation
+"""
+N profiles are split into fixed-size shards. Each shard gets its own seed spawned from one root seed (numpy SeedSequence),
+so shard k always holds the same profiles no matter how many worker processes are used.
+Every worker writes its shard to its own file with ProfileWriter; the shard files are then concatenated byte-for-byte into the output, without parsing them again.
+The concatenation copies each shard to its offset in the output inside the kernel (os.copy_file_range), so the data does not
+pass through Python buffers; with concatenate=False the shards themselves are the output and nothing is copied.
+"""
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+
+def shard_seeds(seed, number_of_shards):
+    import numpy as np
+
+    children = np.random.SeedSequence(seed).spawn(number_of_shards)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+def generate_shard(shard_index, shard_seed, first_id, count, shard_path, pool_size=10_000, batch_size=100_000,
+                   mode='csv', compression=None):
+    generator = ProfileGenerator(seed=shard_seed, pool_size=pool_size, batch_size=batch_size)
+    generator.next_id = first_id
+    # Only the first shard carries the CSV header so that shards concatenate into one valid file
+    write_profiles(generator.generate(count), shard_path, mode, compression, header=shard_index == 0)
+    return shard_index, shard_path
+
+
+def copy_range(source_fd, target_fd, size, offset):
+    """Copy size bytes from the start of source_fd to offset in target_fd."""
+    copied = 0
+    try:
+        while copied < size:
+            n = os.copy_file_range(source_fd, target_fd, size - copied, copied, offset + copied)
+            if n == 0:
+                break
+            copied += n
+    except (AttributeError, OSError):
+        # No copy_file_range on this platform or file system: copy the rest through a buffer
+        while copied < size:
+            chunk = os.pread(source_fd, min(1 << 24, size - copied), copied)
+            if not chunk:
+                break
+            copied += os.pwrite(target_fd, chunk, offset + copied)
+    if copied != size:
+        raise OSError(f"Copied {copied} of {size} bytes")
+
+
+def concatenate_shards(shard_paths, output_path):
+    sizes = [os.path.getsize(shard_path) for shard_path in shard_paths]
+    with open(output_path, 'wb') as out:
+        out.truncate(sum(sizes))
+        offset = 0
+        for shard_path, size in zip(shard_paths, sizes):
+            with open(shard_path, 'rb') as shard:
+                copy_range(shard.fileno(), out.fileno(), size, offset)
+            offset += size
+
+
+def generate_sharded(number_of_profiles, output_path, seed=0, shard_size=1_000_000, workers=None,
+                     pool_size=10_000, batch_size=100_000, mode='csv', compression=None, keep_shards=False,
+                     concatenate=True):
+    """
+    Generate number_of_profiles profiles across a process pool and write them to output_path.
+    With concatenate=False the shards (output_path.shardNNNNN, in order) are kept as the output and their paths returned.
+    """
+    number_of_shards = -(-number_of_profiles // shard_size)
+    seeds = shard_seeds(seed, number_of_shards)
+    shard_paths = [f"{output_path}.shard{k:05d}" for k in range(number_of_shards)]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(generate_shard, k, seeds[k], k * shard_size + 1,
+                        min(shard_size, number_of_profiles - k * shard_size), shard_paths[k], pool_size, batch_size,
+                        mode, compression)
+            for k in range(number_of_shards)
+        ]
+        for future in futures:
+            future.result()
+
+    if not concatenate:
+        return shard_paths
+    concatenate_shards(shard_paths, output_path)
+    if not keep_shards:
+        for shard_path in shard_paths:
+            os.remove(shard_path)
+    return output_path
+
+
+# Usage
+def demo_sharded():
+    output_path = "profiles.csv"
+    for workers in (1, 4):
+        time_start = time.perf_counter()
+        generate_sharded(2_000_000, output_path, seed=42, shard_size=250_000, workers=workers, pool_size=2_000)
+        time_end = time.perf_counter()
+        with open(output_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        print(f"workers={workers}: {time_end - time_start:.2f} s, sha256={digest[:16]}")
+
+    with open(output_path) as f:
+        for _ in range(3):
+            print(f.readline(), end='')
+"""
+workers=1: 18.83 s, sha256=f64f2984e5ffc549
+workers=4: 20.40 s, sha256=f64f2984e5ffc549   (single-core sandbox; the digest is identical for any worker count)
+id;date;age;age_range;sex;job_title;marital_status;education;height;weight;location;BMI;health_record;opt-in;
+m00000001;20050418;114;65+;male;Psychologist, forensic;widowed;masters;158;57;GNB;22.8;h53722908;yes;
+m00000002;20200111;118;65+;male;Designer, jewellery;married;primary;170;71;NAM;24.6;h97011873;no;
+"""
+
+# Benchmark: per-record Faker calls with and without FakerCache
+def build_profile(source):
+    return {
+        'address': source.address(),
+        'company': source.company(),
+        'job': source.job(),
+        'credit_card_number': source.credit_card_number(),
+        'sentence': source.sentence(),
+    }
+
+
+def benchmark_profiles_per_second(source, number_of_records):
+    time_start = time.perf_counter()
+    for _ in range(number_of_records):
+        build_profile(source)
+    return number_of_records / (time.perf_counter() - time_start)
+
+
+# Usage
+def demo_faker_cache():
+    from faker import Faker
+
+    fake_direct = Faker()
+    fake_direct.seed_instance(1)
+    direct_rate = benchmark_profiles_per_second(fake_direct, 20_000)
+
+    time_start = time.perf_counter()
+    cache = FakerCache(Faker(), size=10_000, refresh_interval=100_000, refresh_fraction=0.1)
+    build_profile(cache)  # build the pools
+    time_warm = time.perf_counter() - time_start
+    cached_rate = benchmark_profiles_per_second(cache, 500_000)
+    refreshes = sum(pool.refreshes for pool in cache.pools.values())
+
+    print(f"Direct Faker:  {direct_rate:,.0f} records/s")
+    print(f"FakerCache:    {cached_rate:,.0f} records/s ({cached_rate / direct_rate:.0f}x, pools built in {time_warm:.2f} s, {refreshes} refreshes)")
+"""
+Direct Faker:  2,345 records/s
+FakerCache:    81,889 records/s (35x, pools built in 5.01 s, 25 refreshes)
+"""
+
+
+DEMOS = {
+    'sample': demo_sample,
+    'batch': demo_batch,
+    'writer': demo_writer,
+    'sharded': demo_sharded,
+    'faker_cache': demo_faker_cache,
+}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the synthetic profile examples.")
+    parser.add_argument('demos', nargs='*', metavar='demo', help=f"Examples to run: {', '.join(DEMOS)} (default: all)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.demos if name not in DEMOS]
+    if unknown:
+        parser.error(f"unknown example: {', '.join(unknown)}")
+    for name in args.demos or DEMOS:
+        DEMOS[name]()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,14 @@
+""" data_token.py
+Timestamp and JSON helpers for data tokens. Importing the module has no side effects; the examples run with
+python data_token.py [--json-file data.json]
+Token is the compact in-memory form of a token (epoch-second timestamps, __slots__); TokenTable stores many in flat arrays.
+"""
+import functools
+import json
 import random
+import struct
+import sys
+from array import array
 from datetime import datetime, timedelta
 import time
 
@@ -27,20 +37,21 @@ def is_expired(timestamp):
     return (timestamp_time - current_time).total_seconds() <= 0
 
 # Example usage
-time_start = "2023-09-01_0000_00"
-time_end = "2024-09-01_0000_00"
+def demo_timestamps():
+    time_start = "2023-09-01_0000_00"
+    time_end = "2024-09-01_0000_00"
 
-random_timestamp = generate_random_timestamp(time_start, time_end)
-print("Random Timestamp:", random_timestamp)
+    random_timestamp = generate_random_timestamp(time_start, time_end)
+    print("Random Timestamp:", random_timestamp)
 
-unix_time = timestamp_to_unix(random_timestamp)
-print("Unix Time:", unix_time)
+    unix_time = timestamp_to_unix(random_timestamp)
+    print("Unix Time:", unix_time)
 
-converted_timestamp = unix_to_timestamp(unix_time)
-print("Converted Timestamp:", converted_timestamp)
+    converted_timestamp = unix_to_timestamp(unix_time)
+    print("Converted Timestamp:", converted_timestamp)
 
-expired = is_expired(random_timestamp)
-print("Is Expired:", expired)
+    expired = is_expired(random_timestamp)
+    print("Is Expired:", expired)
 
 """
 Random Timestamp: 2024-08-30_0207_57
@@ -49,8 +60,6 @@ Converted Timestamp: 2024-08-30_0207_57
 Is Expired: True
 """
 
-import json
-
 def create_json_with_dictionary(data_dict):
     """Update the given dictionary with a random timestamp and return it as a JSON string."""
     time_start = data_dict.get('time_start', '2023-09-01_0000_00')
@@ -89,37 +98,37 @@ def print_json(json_data):
 
 
 # Example usage
-json_filename = "data.json"
-
-# Store timestamp in JSON
-data_dict = {
-    'event': 'example_event',
-    'details': 'This is an example data dictionary.',
-    'time_start': "2023-09-01_0000_00",
-    'time_end': "2024-09-01_0000_00"
-}
+def demo_json_file(json_filename="data.json"):
+    # Store timestamp in JSON
+    data_dict = {
+        'event': 'example_event',
+        'details': 'This is an example data dictionary.',
+        'time_start': "2023-09-01_0000_00",
+        'time_end': "2024-09-01_0000_00"
+    }
 
-# Create JSON with dictionary
-data_json = create_json_with_dictionary(data_dict)
-print("Updated JSON String:")
-print(data_json)
+    # Create JSON with dictionary
+    data_json = create_json_with_dictionary(data_dict)
+    print("Updated JSON String:")
+    print(data_json)
 
-print(f"Data stored in {json_filename}")
-store_json_as_file(data_json, json_filename)
+    print(f"Data stored in {json_filename}")
+    store_json_as_file(data_json, json_filename)
 
-json_data_recovered = read_json_from_file(json_filename)
+    json_data_recovered = read_json_from_file(json_filename)
 
-# Check field in JSON
-field_tag_to_look_for = 'time_start' # 'timestamp'
-field_value = check_field_in_json(json_filename, field_tag_to_look_for)
-if field_value:
-    print(f"Field 'timestamp' exists in {json_filename} with value: {field_value}")
-else:
-    print(f"Field 'timestamp' does not exist in {json_filename}")
+    # Check field in JSON
+    field_tag_to_look_for = 'time_start' # 'timestamp'
+    field_value = check_field_in_json(json_filename, field_tag_to_look_for)
+    if field_value:
+        print(f"Field 'timestamp' exists in {json_filename} with value: {field_value}")
+    else:
+        print(f"Field 'timestamp' does not exist in {json_filename}")
 
-# Print JSON file
-print("Pretty JSON Content:")
-print_json(json_data_recovered)
+    # Print JSON file
+    print("Pretty JSON Content:")
+    print_json(json_data_recovered)
+    return json_data_recovered
 
 """
 Updated JSON String:
@@ -159,18 +168,184 @@ def get_all_fields(json_data):
     return fields
 
 # Example usage
-fields = get_all_fields(json_data_recovered)
+def demo_fields(json_data_recovered):
+    fields = get_all_fields(json_data_recovered)
 
-# Convert fields to a list and print it
-fields_list = list(fields)
-print("Fields in JSON:", fields_list)
+    # Convert fields to a list and print it
+    fields_list = list(fields)
+    print("Fields in JSON:", fields_list)
 
-json_data_recursive = '{"event": "example_event", "details": {"info": "This is an example data dictionary.", "time_start": "2023-09-01_0000_00", "time_end": "2024-09-01_0000_00"}}'
-fields = get_all_fields(json.loads(json_data_recursive))
+    json_data_recursive = '{"event": "example_event", "details": {"info": "This is an example data dictionary.", "time_start": "2023-09-01_0000_00", "time_end": "2024-09-01_0000_00"}}'
+    fields = get_all_fields(json.loads(json_data_recursive))
 
-print("Fields in JSON:", fields)
+    print("Fields in JSON:", fields)
 
 """
 Fields in JSON: ['time_start', 'time_end', 'event', 'details', 'timestamp']
 Fields in JSON: {'time_start', 'time_end', 'info', 'event', 'details'}
-"""
\ No newline at end of file
+"""
+
+
+# Compact token records
+"""
+A token held in memory as a dict costs a hash table plus one string per field (about 900 bytes for the example above).
+Token keeps the same fields in __slots__ with the three timestamps as epoch seconds, and converts to and from the JSON shape
+only at the edges. TokenTable holds many tokens as int64 arrays plus indexes into lists of distinct event and details strings.
+Binary layout (to_bytes): int64 time_start | int64 time_end | int64 timestamp | uint16 len + UTF-8 event | uint32 len + UTF-8 details
+"""
+TOKEN_HEADER = struct.Struct('<qqqH')
+TOKEN_FIELDS = ('event', 'details', 'time_start', 'time_end', 'timestamp')
+TOKEN_TIME_FIELDS = ('time_start', 'time_end', 'timestamp')
+# Tokens parsed from JSON get their own copy of every string and int. Recently seen details strings and timestamps
+# (typically shared validity windows) are looked up here instead, so equal values share one object.
+TOKEN_VALUE_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=TOKEN_VALUE_CACHE_SIZE)
+def _shared_details(details):
+    return details
+
+
+@functools.lru_cache(maxsize=TOKEN_VALUE_CACHE_SIZE)
+def _shared_unix_time(timestamp):
+    return timestamp_to_unix(timestamp)
+
+
+class Token:
+    __slots__ = TOKEN_FIELDS
+
+    def __init__(self, event, details, time_start, time_end, timestamp):
+        self.event = event
+        self.details = details
+        self.time_start = time_start  # epoch seconds
+        self.time_end = time_end
+        self.timestamp = timestamp
+
+    def is_expired(self, now=None):
+        return self.timestamp <= (time.time() if now is None else now)
+
+    @classmethod
+    def from_json(cls, data):
+        """Build a Token from the dictionary shape of create_json_with_dictionary (timestamps as "%Y-%m-%d_%H%M_%S")."""
+        missing = [field for field in TOKEN_FIELDS if field not in data]
+        if missing:
+            raise ValueError(f"Token is missing {', '.join(missing)}")
+        # Event names come from a small set; interning keeps one copy of each
+        return cls(sys.intern(data['event']), _shared_details(data['details']),
+                   *(_shared_unix_time(data[field]) for field in TOKEN_TIME_FIELDS))
+
+    def to_json(self):
+        data = {'event': self.event, 'details': self.details}
+        for field in TOKEN_TIME_FIELDS:
+            data[field] = unix_to_timestamp(getattr(self, field))
+        return data
+
+    def to_bytes(self):
+        event, details = self.event.encode(), self.details.encode()
+        return (TOKEN_HEADER.pack(self.time_start, self.time_end, self.timestamp, len(event)) + event
+                + struct.pack('<I', len(details)) + details)
+
+    @classmethod
+    def from_bytes(cls, data):
+        time_start, time_end, timestamp, event_length = TOKEN_HEADER.unpack_from(data)
+        offset = TOKEN_HEADER.size
+        event = bytes(data[offset:offset + event_length]).decode()
+        offset += event_length
+        (details_length,) = struct.unpack_from('<I', data, offset)
+        offset += 4
+        details = bytes(data[offset:offset + details_length]).decode()
+        return cls(event, details, time_start, time_end, timestamp)
+
+    def __eq__(self, other):
+        if not isinstance(other, Token):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in TOKEN_FIELDS)
+
+    def __repr__(self):
+        return f"Token(event={self.event!r}, timestamp={self.timestamp})"
+
+
+class TokenTable:
+    """
+    Column store for large numbers of tokens: three int64 timestamp columns and uint32 indexes into the lists of distinct
+    event and details strings, 32 bytes per token plus each distinct string once. Indexing returns a Token.
+    """
+    def __init__(self, tokens=()):
+        self.time_start = array('q')
+        self.time_end = array('q')
+        self.timestamp = array('q')
+        self.event_ids = array('I')
+        self.details_ids = array('I')
+        self.strings = []
+        self._string_index = {}
+        for token in tokens:
+            self.append(token)
+
+    def _string_id(self, value):
+        string_id = self._string_index.get(value)
+        if string_id is None:
+            string_id = self._string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def append(self, token):
+        self.time_start.append(token.time_start)
+        self.time_end.append(token.time_end)
+        self.timestamp.append(token.timestamp)
+        self.event_ids.append(self._string_id(token.event))
+        self.details_ids.append(self._string_id(token.details))
+        return len(self.timestamp) - 1
+
+    def __getitem__(self, index):
+        return Token(self.strings[self.event_ids[index]], self.strings[self.details_ids[index]],
+                     self.time_start[index], self.time_end[index], self.timestamp[index])
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+    def expired(self, now=None):
+        """Row indexes of the tokens whose timestamp has passed."""
+        now = time.time() if now is None else now
+        return [index for index, timestamp in enumerate(self.timestamp) if timestamp <= now]
+
+
+# Example usage
+def demo_tokens(number_of_tokens=100_000):
+    data_dict = {
+        'event': 'example_event',
+        'details': 'This is an example data dictionary.',
+        'time_start': "2023-09-01_0000_00",
+        'time_end': "2024-09-01_0000_00"
+    }
+    token = Token.from_json(json.loads(create_json_with_dictionary(dict(data_dict))))
+    print(token, "->", len(token.to_bytes()), "bytes:", token.to_json())
+    assert Token.from_bytes(token.to_bytes()) == token
+
+    table = TokenTable(Token.from_json(json.loads(create_json_with_dictionary(dict(data_dict))))
+                       for _ in range(number_of_tokens))
+    print(f"{len(table)} tokens in a TokenTable, {len(table.expired())} expired")
+
+"""
+Token(event='example_event', timestamp=1698296464) -> 78 bytes: {'event': 'example_event', 'details': 'This is an example data dictionary.', 'time_start': '2023-09-01_0000_00', 'time_end': '2024-09-01_0000_00', 'timestamp': '2023-10-26_0501_04'}
+100000 tokens in a TokenTable, 100000 expired
+"""
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the data token examples.")
+    parser.add_argument('--json-file', default="data.json", help="File the JSON example writes and reads back")
+    args = parser.parse_args(argv)
+
+    demo_timestamps()
+    json_data_recovered = demo_json_file(args.json_file)
+    demo_fields(json_data_recovered)
+    demo_tokens()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+"""
+Flask examples, imported as python.flask. With python/ itself as the working directory this package shadows the flask
+library; none of the scripts there import it, and the servers are run from their own folders (flask run).
+"""
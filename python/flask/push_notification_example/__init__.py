@@ -0,0 +1 @@
+"""Webhook, SSE and Web Push notification example (see readme.txt)."""
@@ -25,49 +25,251 @@ from datetime import datetime
 # Define the server URL
 SERVER_URL = "http://127.0.0.1:5000/webhook"
 
+# Event shapes sent by the interactive client
+EVENT_TEMPLATES = {
+    'new': {
+        'event': 'zero-day vulnerability',
+        'details': 'A new zero-day vulnerability has been discovered in XYZ software.',
+    },
+    'resolved': {
+        'event': 'zero-day vulnerability resolved',
+        'details': 'The previously reported zero-day vulnerability in XYZ software has been resolved.',
+    },
+    'clear': {
+        'event': '------------------',
+        'details': '------------------',
+    },
+}
+
+def make_event(event_type, timestamp=None):
+    """Build the webhook payload for 'new', 'resolved' or 'clear'."""
+    data = dict(EVENT_TEMPLATES[event_type])
+    data['timestamp'] = timestamp or datetime.now().strftime('%Y-%m-%d_%H%M_%S')
+    return data
+
+_session = requests.Session()
+
 def send_data(data):
     """Send the webhook data to the server."""
-    response = requests.post(SERVER_URL, json=data)
+    response = _session.post(SERVER_URL, json=data)
     if response.status_code == 200:
         print(f"Sent data: {data}")
     else:
         print(f"Failed to send data: {response.status_code}")
 
+
+# Batching client library
+import asyncio
+import threading
+import uuid
+from collections import deque
+from requests.adapters import HTTPAdapter
+
+class WebhookClient:
+    """
+    Buffers events and sends them to /webhook/batch over a pooled keep-alive session.
+    A batch is flushed when it reaches batch_size events or flush_interval seconds after its first event.
+    Each batch carries an Idempotency-Key, so retrying a batch whose response was lost does not store it twice.
+    A batch that still fails after max_retries is counted in failed (events), its exception is kept in errors (the
+    last max_errors), and on_failure(batch, exception) is called, e.g. to re-queue it with send() or store it.
+
+    with WebhookClient() as client:
+        for data in events:
+            client.send(data)
+    """
+    def __init__(self, base_url="http://127.0.0.1:5000", batch_size=1000, flush_interval=0.05,
+                 max_retries=3, backoff=0.2, pool_size=10, timeout=30, max_errors=100, on_failure=None):
+        self.url = base_url.rstrip('/') + "/webhook/batch"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.sent = 0
+        self.failed = 0
+        self.errors = deque(maxlen=max_errors)
+        self.on_failure = on_failure
+        self._buffer = []
+        self._buffer_started = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self._flusher.start()
+
+    def send(self, data):
+        """Queue one event; returns immediately unless this event fills a batch."""
+        with self._lock:
+            if not self._buffer:
+                self._buffer_started = time.monotonic()
+            self._buffer.append(data)
+            if len(self._buffer) < self.batch_size:
+                return
+            batch, self._buffer = self._buffer, []
+        self._post(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if batch:
+            self._post(batch)
+
+    def close(self):
+        self._closed.set()
+        self._flusher.join()
+        self.flush()
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval / 2):
+            with self._lock:
+                due = self._buffer and time.monotonic() - self._buffer_started >= self.flush_interval
+            if due:
+                self.flush()
+
+    def _post(self, batch):
+        try:
+            post_batch(self.session, self.url, batch, self.max_retries, self.backoff, self.timeout)
+        except Exception as ex:
+            with self._lock:
+                self.failed += len(batch)
+                self.errors.append(ex)
+            if self.on_failure:
+                self.on_failure(batch, ex)
+            return
+        with self._lock:
+            self.sent += len(batch)
+
+
+def post_batch(session, url, batch, max_retries=3, backoff=0.2, timeout=30):
+    """POST one batch with retries on connection errors and 5xx; the same Idempotency-Key is used for every attempt."""
+    headers = {'Content-Type': 'application/json', 'Idempotency-Key': uuid.uuid4().hex}
+    body = json.dumps(batch, separators=(',', ':'))
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.post(url, data=body, headers=headers, timeout=timeout)
+            if response.status_code < 500:
+                response.raise_for_status()
+                return response.json()
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt == max_retries:
+                raise
+        if attempt == max_retries:
+            response.raise_for_status()
+        time.sleep(backoff * 2 ** attempt)
+
+
+class AsyncWebhookClient:
+    """
+    asyncio variant of WebhookClient: await client.send(data) buffers the event, and full batches are posted
+    by up to max_concurrency requests in flight at once (each on a worker thread using the pooled session).
+    Every batch task, including those started by the flush timer, is kept until it finishes, and flush()/close() wait
+    for them; failures are recorded as in WebhookClient (failed, errors, on_failure).
+
+    async with AsyncWebhookClient() as client:
+        for data in events:
+            await client.send(data)
+    """
+    def __init__(self, base_url="http://127.0.0.1:5000", batch_size=1000, flush_interval=0.05,
+                 max_concurrency=8, max_retries=3, backoff=0.2, timeout=30, max_errors=100, on_failure=None):
+        self.url = base_url.rstrip('/') + "/webhook/batch"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.sent = 0
+        self.failed = 0
+        self.errors = deque(maxlen=max_errors)
+        self.on_failure = on_failure
+        self._buffer = []
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight = set()
+        self._timer = None
+
+    async def send(self, data):
+        self._buffer.append(data)
+        if len(self._buffer) >= self.batch_size:
+            await self._post_buffer()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._track(asyncio.ensure_future(self._post_buffer()))
+
+    def _track(self, task):
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def flush(self):
+        """Post whatever is buffered and wait for every in-flight batch."""
+        await self._post_buffer()
+        # A timer task can start a batch while we wait, so repeat until nothing is left
+        while self._in_flight:
+            await asyncio.gather(*self._in_flight)
+
+    async def _post_buffer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        # Waiting for a free slot here is what bounds concurrency and applies backpressure to send()
+        await self._slots.acquire()
+        self._track(asyncio.ensure_future(self._post(batch)))
+
+    async def _post(self, batch):
+        try:
+            await asyncio.to_thread(post_batch, self.session, self.url, batch, self.max_retries, self.backoff, self.timeout)
+            self.sent += len(batch)
+        except Exception as ex:
+            self.failed += len(batch)
+            self.errors.append(ex)
+            if self.on_failure:
+                self.on_failure(batch, ex)
+        finally:
+            self._slots.release()
+
+    async def close(self):
+        await self.flush()
+        self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
 def main():
     # Loop to allow sending multiple events
     while True:
         # Choose the event type (either 'new' or 'resolved')
         event_type = input("Enter event type ('new' or 'resolved', or 'clear' to remove last data): ").strip().lower()
-        
-        timestamp = datetime.now().strftime('%Y-%m-%d_%H%M_%S')  # Get current timestamp
-
-        if event_type == 'new':
-            data = {
-                'event': 'zero-day vulnerability',
-                'details': 'A new zero-day vulnerability has been discovered in XYZ software.',
-                'timestamp': timestamp  # Add timestamp to data
-            }
-            send_data(data)
-
-        elif event_type == 'resolved':
-            data = {
-                'event': 'zero-day vulnerability resolved',
-                'details': 'The previously reported zero-day vulnerability in XYZ software has been resolved.',
-                'timestamp': timestamp  # Add timestamp to data
-            }
-            send_data(data)
+
+        if event_type in ('new', 'resolved'):
+            send_data(make_event(event_type))
 
         elif event_type == 'clear':
             clear_option = input("Do you want to clear the data before the next send? (yes/no): ").strip().lower()
             if clear_option == 'yes':
                 print("Clearing data...")
-                # Clear the data variable (if any processing is required, add it here)
-                data = {
-                    'event': '------------------',
-                    'details': '------------------',
-                    'timestamp': timestamp  # Add timestamp to data
-                }
-                send_data(data)
+                send_data(make_event('clear'))
                 
                 continue  # Skip to the next iteration
 
@@ -80,5 +282,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
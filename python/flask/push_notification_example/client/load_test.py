@@ -0,0 +1,253 @@
+"""
+End-to-end load test for the webhook + SSE pipeline.
+
+Starts a local server (or uses --url with --server-pid), opens N /stream subscribers, posts the 'new' / 'resolved' / 'clear'
+events from client.py to /webhook at a fixed rate, and measures for every event how long it took from the POST
+until each subscriber received it. Server RSS is sampled throughout. Results are printed and saved as JSON so
+server changes can be compared run to run.
+
+python load_test.py --rate 200 --duration 10 --subscribers 50 --output results.json
+python load_test.py --stream-url http://127.0.0.1:5001/stream ...   (SSE hub, started with SSE_HUB_PORT=5001)
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+
+from client import make_event
+
+EVENT_TYPES = ('new', 'resolved', 'clear')
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'server')
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def read_rss_kb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def wait_for_port(host, port, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start listening on {host}:{port}")
+
+
+def start_server(port, hub_port=None):
+    """Run server/app.py in a child process with its own temporary event log and subscription store."""
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    env = dict(os.environ,
+               EVENT_LOG_PATH=os.path.join(workdir, 'events.ndjson'),
+               SUBSCRIPTIONS_PATH=os.path.join(workdir, 'subscriptions.sqlite3'))
+    if hub_port:
+        env['SSE_HUB_PORT'] = str(hub_port)
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'run', '--port', str(port), '--with-threads'],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wait_for_port('127.0.0.1', port)
+    if hub_port:
+        wait_for_port('127.0.0.1', hub_port)
+    return process
+
+
+class LoadTest:
+    def __init__(self, url, stream_url, rate, duration, subscribers, publishers, server_pid=None):
+        self.url = url.rstrip('/')
+        self.stream_url = stream_url or self.url + '/stream'
+        self.rate = rate
+        self.duration = duration
+        self.number_of_subscribers = subscribers
+        self.number_of_publishers = publishers
+        self.server_pid = server_pid
+        # Tag in the details of every event of this run, so events from earlier runs are ignored
+        self.marker = f"load-test {uuid.uuid4().hex[:8]}"
+        self.pattern = re.compile(re.escape(self.marker).encode() + rb" seq=(\d+)")
+        self.sent_at = {}
+        self.latencies = []
+        self.received = 0
+        self.post_errors = 0
+        self.rss_samples = []
+        self.started = None
+        self._connected = 0
+        self._done = threading.Event()
+
+    # Subscribers
+
+    async def _subscriber(self, ready):
+        url = urlparse(self.stream_url)
+        reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+        writer.write(f"GET {url.path or '/'} HTTP/1.0\r\nHost: {url.netloc}\r\nAccept: text/event-stream\r\n\r\n".encode())
+        await writer.drain()
+        self._connected += 1
+        if self._connected == self.number_of_subscribers:
+            ready.set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                match = self.pattern.search(line)
+                if match:
+                    received_at = time.perf_counter()
+                    sent_at = self.sent_at.get(int(match.group(1)))
+                    if sent_at is not None:
+                        self.latencies.append(received_at - sent_at)
+                        self.received += 1
+        finally:
+            writer.close()
+
+    def _run_subscribers(self, ready, stop):
+        async def run():
+            tasks = [asyncio.ensure_future(self._subscriber(ready)) for _ in range(self.number_of_subscribers)]
+            while not stop.is_set():
+                await asyncio.sleep(0.05)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.run(run())
+
+    # Publishers
+
+    def _publisher(self, offset, total):
+        session = requests.Session()
+        for seq in range(offset, total, self.number_of_publishers):
+            due = self.started + seq / self.rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            data = make_event(EVENT_TYPES[seq % len(EVENT_TYPES)])
+            data['details'] = f"{data['details']} [{self.marker} seq={seq}]"
+            self.sent_at[seq] = time.perf_counter()
+            try:
+                if session.post(self.url + '/webhook', json=data, timeout=30).status_code != 200:
+                    self.post_errors += 1
+            except requests.RequestException:
+                self.post_errors += 1
+
+    def _sample_rss(self):
+        while not self._done.wait(0.5):
+            rss = read_rss_kb(self.server_pid)
+            if rss is not None:
+                self.rss_samples.append((round(time.perf_counter() - self.started, 2), rss))
+
+    def run(self, drain_timeout=10):
+        ready, stop = threading.Event(), threading.Event()
+        subscriber_thread = threading.Thread(target=self._run_subscribers, args=(ready, stop), daemon=True)
+        subscriber_thread.start()
+        if not ready.wait(30):
+            raise RuntimeError(f"Only {self._connected}/{self.number_of_subscribers} subscribers connected")
+        time.sleep(0.5)
+
+        total = int(self.rate * self.duration)
+        self.started = time.perf_counter()
+        if self.server_pid:
+            threading.Thread(target=self._sample_rss, daemon=True).start()
+        publishers = [threading.Thread(target=self._publisher, args=(offset, total))
+                      for offset in range(self.number_of_publishers)]
+        for publisher in publishers:
+            publisher.start()
+        for publisher in publishers:
+            publisher.join()
+        publish_seconds = time.perf_counter() - self.started
+
+        expected = total * self.number_of_subscribers
+        deadline = time.monotonic() + drain_timeout
+        while self.received < expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - self.started
+        self._done.set()
+        stop.set()
+        subscriber_thread.join()
+
+        latencies = sorted(self.latencies)
+        rss = [kb for _, kb in self.rss_samples]
+        return {
+            'config': {
+                'url': self.url, 'stream_url': self.stream_url, 'rate': self.rate, 'duration': self.duration,
+                'subscribers': self.number_of_subscribers, 'publishers': self.number_of_publishers,
+            },
+            'events_sent': total,
+            'post_errors': self.post_errors,
+            'publish_rate_per_second': total / publish_seconds,
+            'frames_expected': expected,
+            'frames_received': self.received,
+            'delivery_rate_per_second': self.received / elapsed,
+            'latency_ms': {name: round(percentile(latencies, p) * 1000, 3) if latencies else None
+                           for name, p in (('p50', 0.50), ('p99', 0.99), ('p999', 0.999), ('max', 1.0))},
+            'server_rss_kb': {'start': rss[0] if rss else None, 'end': rss[-1] if rss else None,
+                              'max': max(rss) if rss else None, 'samples': self.rss_samples},
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="Server to test; by default a local server is started")
+    parser.add_argument('--server-pid', type=int, help="PID of the --url server, for RSS sampling")
+    parser.add_argument('--stream-url', help="SSE endpoint (default <url>/stream)")
+    parser.add_argument('--hub', action='store_true', help="Start the local server with the SSE hub and subscribe to it")
+    parser.add_argument('--port', type=int, default=5090)
+    parser.add_argument('--rate', type=float, default=200, help="Events per second")
+    parser.add_argument('--duration', type=float, default=10, help="Seconds of publishing")
+    parser.add_argument('--subscribers', type=int, default=50)
+    parser.add_argument('--publishers', type=int, default=4, help="Concurrent publishing threads")
+    parser.add_argument('--output', default='load_test_results.json')
+    args = parser.parse_args()
+
+    server = None
+    url, server_pid, stream_url = args.url, args.server_pid, args.stream_url
+    if url is None:
+        server = start_server(args.port, args.port + 1 if args.hub else None)
+        url, server_pid = f"http://127.0.0.1:{args.port}", server.pid
+        if args.hub:
+            stream_url = f"http://127.0.0.1:{args.port + 1}/stream"
+    try:
+        results = LoadTest(url, stream_url, args.rate, args.duration, args.subscribers, args.publishers, server_pid).run()
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    results['started'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+
+    latency = results['latency_ms']
+    rss = results['server_rss_kb']
+    print(f"Published {results['events_sent']} events at {results['publish_rate_per_second']:.0f}/s "
+          f"({results['post_errors']} errors)")
+    print(f"Received  {results['frames_received']}/{results['frames_expected']} frames "
+          f"({results['delivery_rate_per_second']:.0f}/s) by {args.subscribers} subscribers")
+    print(f"Latency   p50 {latency['p50']} ms, p99 {latency['p99']} ms, p999 {latency['p999']} ms, max {latency['max']} ms")
+    if rss['start'] is not None:
+        print(f"RSS       {rss['start'] / 1024:.1f} MB -> {rss['end'] / 1024:.1f} MB (max {rss['max'] / 1024:.1f} MB)")
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
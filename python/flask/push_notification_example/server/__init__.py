@@ -0,0 +1 @@
+"""Flask server of the push notification example: flask run in this folder, which imports it as a package."""
@@ -1,53 +1,294 @@
-from flask import Flask, request, Response, render_template
+from flask import Flask, request, Response, render_template, jsonify, make_response, g
+from markupsafe import Markup
+import json
+import os
+import threading
 import time
-from pywebpush import webpush, WebPushException
+from collections import OrderedDict
+from pywebpush import WebPushException
+
+from .event_log import EventLog
+from .event_store import EventStore
+from .push_dispatcher import EXPIRED_STATUS, PushDispatcher
+from .subscription_registry import SubscriptionRegistry
+from .sse_hub import SSEHub, parse_last_event_id
+
+# Shared instrumentation layer in python/instrumentation.py (enabled with INSTRUMENTATION=1)
+from ....instrumentation import REGISTRY, profile
 
 app = Flask(__name__)
 
-# Dummy subscription info for push notifications
-subscription_info = {
-    "endpoint": "https://example.com/...",
-    "keys": {
-        "p256dh": "public_key",
-        "auth": "auth_key"
-    }
-}
+# Most recent webhook events, bounded so memory and page render cost stay constant
+received_data = EventStore(capacity=int(os.environ.get('EVENT_STORE_CAPACITY', 1000)))
+
+# Optional async SSE hub for large numbers of subscribers: SSE_HUB_PORT=5001 serves http://127.0.0.1:5001/stream
+sse_hub = None
+if os.environ.get('SSE_HUB_PORT'):
+    sse_hub = SSEHub(store=received_data)
+    sse_hub.start(port=int(os.environ['SSE_HUB_PORT']))
+
+# Push subscriptions sent by the service worker, indexed by the webhook "event" they want
+subscriptions = SubscriptionRegistry(os.environ.get('SUBSCRIPTIONS_PATH', 'subscriptions.sqlite3'))
+
+def publish_events(records):
+    REGISTRY.count('events_published', len(records))
+    events = received_data.load(records)  # renders each event's SSE and HTML bytes once
+    if sse_hub:
+        for event in events:
+            sse_hub.publish(event)
+    for _, data in records:
+        targets = subscriptions.matching(data['event'])
+        if targets:
+            get_push_dispatcher().dispatch(json.dumps(data), targets)
+
+# Every webhook event is group-committed to an append-only log before it is acknowledged and published,
+# and the most recent events are reloaded from it on startup
+event_log = EventLog(os.environ.get('EVENT_LOG_PATH', 'events.ndjson'), on_commit=publish_events)
+received_data.load(event_log.tail(received_data.capacity))
+
+REQUIRED_EVENT_FIELDS = ('event', 'details', 'timestamp')
+# Used as subscription topics and rendered into SSE/HTML, so they must be strings
+STRING_EVENT_FIELDS = ('event', 'details')
+
+def validate_events(events):
+    """Return an error message for the first invalid event, or None if all are valid."""
+    if not isinstance(events, list):
+        return "Expected a JSON object, a JSON array or NDJSON"
+    for index, data in enumerate(events):
+        if not isinstance(data, dict):
+            return f"Event {index} is not a JSON object"
+        missing = [field for field in REQUIRED_EVENT_FIELDS if field not in data]
+        if missing:
+            return f"Event {index} is missing {', '.join(missing)}"
+        not_strings = [field for field in STRING_EVENT_FIELDS if not isinstance(data[field], str)]
+        if not_strings:
+            return f"Event {index}: {', '.join(not_strings)} must be a string"
+    return None
 
-# Global variable to hold received webhook data
-received_data = []
+@app.before_request
+def start_request_timer():
+    if REGISTRY.enabled:
+        g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    # For /stream this is the time to open the stream, not its lifetime
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REGISTRY.observe('http_request', time.perf_counter() - started, endpoint=endpoint)
+        REGISTRY.count('http_requests', endpoint=endpoint, status=response.status_code)
+    return response
+
+# The index page is rendered once per new event and served from this cache (with an ETag) until the next one
+BOOT_ID = os.urandom(4).hex()
+index_cache = {'last_id': None, 'body': None}
+index_cache_lock = threading.Lock()
 
 @app.route('/')
 def index():
-    return render_template('index.html', data=received_data)
+    last_id = received_data.last_id
+    with index_cache_lock:
+        cached = index_cache if index_cache['last_id'] == last_id else None
+    if cached is None:
+        events = received_data.latest()
+        last_id = events[-1].id if events else 0
+        body = render_template('index.html', events_html=Markup(b''.join(event.html for event in events).decode()),
+                               last_event_id=last_id)
+        cached = {'last_id': last_id, 'body': body}
+        with index_cache_lock:
+            index_cache.update(cached)
+    response = make_response(cached['body'])
+    response.set_etag(f"{BOOT_ID}-{cached['last_id']}")
+    return response.make_conditional(request)
+
+@app.route('/events')
+def events_since():
+    """HTML fragments of the events after ?since=<id>, for refreshing the page without a full render."""
+    events = received_data.since(request.args.get('since', 0, type=int))
+    response = Response(b''.join(event.html for event in events), mimetype='text/html')
+    response.headers['X-Last-Event-ID'] = str(events[-1].id if events else received_data.last_id)
+    return response
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
     data = request.json
-    print("Received data:", data)
-    received_data.append(data)  # Store received data. Consider: clear received_data. 
+    app.logger.debug("Received data: %s", data)
+    error = validate_events([data])
+    if error:
+        return error, 400
+    event_log.write([data])
+    return 'OK', 200
+
+# Responses to recent batches by Idempotency-Key, so a client retrying after a lost response does not store the batch twice.
+# While a batch is being written its key maps to a threading.Event instead, which a concurrent retry waits on.
+RECENT_BATCH_KEYS = 10_000
+# Seconds a retry waits for the request writing the same batch before it is answered 503 (the client retries later)
+BATCH_KEY_WAIT_TIMEOUT = 30
+recent_batches = OrderedDict()
+recent_batches_lock = threading.Lock()
+
+def reserve_batch_key(key):
+    """
+    Return the stored response for key, or None once key is reserved for the caller, who must finish_batch_key it.
+    Raises TimeoutError if another request has been writing the same batch for BATCH_KEY_WAIT_TIMEOUT seconds.
+    """
+    while True:
+        with recent_batches_lock:
+            entry = recent_batches.get(key)
+            if entry is None:
+                recent_batches[key] = threading.Event()
+                evict_batch_keys()
+                return None
+            if not isinstance(entry, threading.Event):
+                return entry
+        # Another request is writing this batch; if it fails the key is released and we try again
+        if not entry.wait(BATCH_KEY_WAIT_TIMEOUT):
+            raise TimeoutError(f"Batch {key} is still being written")
+
+def evict_batch_keys():
+    """Drop the oldest stored responses beyond RECENT_BATCH_KEYS; reservations in flight are never dropped."""
+    while len(recent_batches) > RECENT_BATCH_KEYS:
+        oldest = next((key for key, entry in recent_batches.items() if not isinstance(entry, threading.Event)), None)
+        if oldest is None:
+            return
+        del recent_batches[oldest]
+
+def finish_batch_key(key, result):
+    """Store the response for a reserved key, or release it if result is None, and wake any waiting retries."""
+    with recent_batches_lock:
+        in_flight = recent_batches.pop(key, None)
+        if result is not None:
+            recent_batches[key] = result
+    if isinstance(in_flight, threading.Event):
+        in_flight.set()
+
+@app.route('/webhook/batch', methods=['POST'])
+def webhook_batch():
+    """Accept a JSON array or NDJSON body of events; acknowledged once the whole batch is on disk."""
+    body = request.get_data()
+    try:
+        if body.lstrip().startswith(b'['):
+            events = json.loads(body)
+        else:
+            events = [json.loads(line) for line in body.splitlines() if line.strip()]
+    except ValueError:
+        return "Malformed JSON", 400
+    error = validate_events(events)
+    if error:
+        return error, 400
+    if not events:
+        return jsonify(accepted=0)
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key:
+        try:
+            result = reserve_batch_key(idempotency_key)
+        except TimeoutError as ex:
+            return str(ex), 503
+        if result is not None:
+            return jsonify(result)
+    result = None
+    try:
+        first_id = event_log.write(events)
+        result = {'accepted': len(events), 'first_id': first_id, 'last_id': first_id + len(events) - 1}
+    finally:
+        if idempotency_key:
+            finish_batch_key(idempotency_key, result)
+    return jsonify(result)
+
+@app.route('/subscribe', methods=['POST'])
+def subscribe():
+    """Body: a PushSubscription JSON, or {"subscription": <PushSubscription>, "topics": ["zero-day vulnerability", ...]}."""
+    body = request.json or {}
+    if not isinstance(body, dict):
+        return "Expected a JSON object", 400
+    subscription_info = body.get('subscription', body)
+    try:
+        subscriptions.subscribe(subscription_info, body.get('topics'))
+    except ValueError as ex:
+        return str(ex), 400
+    return 'OK', 201
+
+@app.route('/unsubscribe', methods=['POST'])
+def unsubscribe():
+    body = request.json or {}
+    if not isinstance(body, dict) or not isinstance(body.get('endpoint'), str):
+        return "Expected a JSON object with an endpoint", 400
+    if not subscriptions.unsubscribe(body['endpoint']):
+        return 'Unknown subscription', 404
     return 'OK', 200
 
+# Seconds without events before a keep-alive comment is sent on /stream
+STREAM_KEEPALIVE_INTERVAL = 15
+
 @app.route('/stream')
 def stream():
-    def event_stream():
+    # EventSource sends Last-Event-ID when it reconnects; resume right after that event.
+    # The index page passes ?last_event_id= for the events it already shows. Without either, only new events are sent
+    # (the same as the SSE hub); see EventStore.resume_id
+    last_id = received_data.resume_id(parse_last_event_id(request.headers.get('Last-Event-ID')
+                                                          or request.args.get('last_event_id')))
+
+    def event_stream(last_id):
         while True:
-            time.sleep(1)
-            yield f"data: The current time is {time.ctime()}\n\n"
-            if received_data:  # Send webhook data if available
-                for data in received_data:
-                    yield f"data: Event: {data['event']}, Details: {data['details']}, Timestamp: {data['timestamp']}\n\n"
-    return Response(event_stream(), mimetype="text/event-stream")
+            events = received_data.wait_since(last_id, timeout=STREAM_KEEPALIVE_INTERVAL)
+            if not events:
+                yield b": keep-alive\n\n"
+                continue
+            # Pre-rendered frames: nothing is formatted per subscriber
+            yield b''.join(event.sse for event in events)
+            last_id = events[-1].id
+    return Response(event_stream(last_id), mimetype="text/event-stream")
+
+@app.route('/metrics')
+def metrics():
+    """Counters and latency histograms in the Prometheus text format, followed by gauges of the server's state."""
+    lines = [
+        "# TYPE event_store_events gauge", f"event_store_events {len(received_data)}",
+        "# TYPE event_store_last_id gauge", f"event_store_last_id {received_data.last_id}",
+        "# TYPE event_log_callback_errors_total counter", f"event_log_callback_errors_total {event_log.callback_errors}",
+    ]
+    if sse_hub:
+        lines += ["# TYPE sse_hub_subscribers gauge", f"sse_hub_subscribers {len(sse_hub.subscribers)}",
+                  "# TYPE sse_hub_dropped_total counter", f"sse_hub_dropped_total {sse_hub.dropped}",
+                  "# TYPE sse_hub_disconnected_total counter", f"sse_hub_disconnected_total {sse_hub.disconnected}"]
+    if push_dispatcher:
+        for outcome, value in push_dispatcher.metrics.snapshot().items():
+            if outcome in ('delivered', 'failed', 'retried', 'pruned', 'dropped'):
+                lines += [f"# TYPE push_{outcome}_total counter", f"push_{outcome}_total {value}"]
+    return Response(REGISTRY.render() + '\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+# Opt-in sampling profiler: with PROFILER_ENABLED=1, GET /debug/profile?seconds=10 samples every thread for that
+# window and returns per-function self/total percentages
+@app.route('/debug/profile')
+def debug_profile():
+    if os.environ.get('PROFILER_ENABLED', '') in ('', '0'):
+        return 'Profiler disabled; start the server with PROFILER_ENABLED=1', 404
+    seconds = min(request.args.get('seconds', 10, type=float), 300)
+    interval = request.args.get('interval', 0.005, type=float)
+    return Response(profile(seconds, interval, request.args.get('top', 30, type=int)), mimetype='text/plain')
+
+# Created on first use so the server starts without a VAPID key (private_key.pem) in place
+push_dispatcher = None
+
+def get_push_dispatcher():
+    global push_dispatcher
+    if push_dispatcher is None:
+        push_dispatcher = PushDispatcher(
+            vapid_private_key=os.environ.get('VAPID_PRIVATE_KEY', 'private_key.pem'),
+            vapid_claims={"sub": "mailto:you@example.com"},
+            on_expired=subscriptions.unsubscribe,
+        )
+    return push_dispatcher
 
 def send_push_notification(subscription_info, message):
     try:
-        response = webpush(
-            subscription_info=subscription_info,
-            data=message,
-            vapid_private_key="private_key.pem",
-            vapid_claims={"sub": "mailto:you@example.com"}
-        )
+        response = get_push_dispatcher().send_now(subscription_info, message)
         return response
     except WebPushException as ex:
+        # The push service answered 404/410: the subscription is gone, as PushDispatcher prunes it
+        if ex.response is not None and ex.response.status_code in EXPIRED_STATUS:
+            subscriptions.unsubscribe(subscription_info['endpoint'])
         print("Failed to send push notification: {}", repr(ex))
 
 if __name__ == '__main__':
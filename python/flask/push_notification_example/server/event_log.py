@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Sidecar file <log>.count: byte offset of the end of the last commit and the number of events up to it
+CHECKPOINT = struct.Struct('<QQ')
+# Bytes read at a time when scanning the log backwards from its end
+BLOCK_SIZE = 1 << 16
+
+
+class Commit:
+    """Handle returned by EventLog.submit(); wait() returns once the events are on disk."""
+    __slots__ = ('events', 'first_id', 'error', '_done')
+
+    def __init__(self, events):
+        self.events = events
+        self.first_id = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Event log commit timed out")
+        if self.error is not None:
+            raise self.error
+        return self.first_id
+
+
+class EventLog:
+    """
+    Append-only NDJSON log of webhook events, written by one background thread.
+    Whatever has been submitted while the previous write was in progress is written and fsync'd together
+    (group commit), so a burst of requests costs one fsync instead of one each.
+    The event ID is the event's line number in the log, so IDs survive restarts.
+    on_commit([(event_id, data), ...]) is called after every fsync, in log order. Its exceptions are logged and counted
+    (callback_errors), not raised: the events are already durable, and failing their requests would make clients retry
+    and log them twice.
+    Opening and tail(n) never read the whole log: the event count comes from the checkpoint in <log>.count (rewritten
+    after every commit, and only the bytes after it are counted), and a partial last line and the last n events are
+    found by reading backwards from the end of the file.
+    """
+    def __init__(self, path, on_commit=None, max_batch=10_000):
+        self.path = path
+        self.on_commit = on_commit
+        self.max_batch = max_batch
+        self.count = 0
+        self.callback_errors = 0
+        self._size = 0
+        self._recover()
+        self._committed = (self._size, self.count)  # read together by tail()
+        self._file = open(path, 'ab')
+        self._checkpoint = open(path + '.count', 'r+b' if os.path.exists(path + '.count') else 'w+b')
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _recover(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            # A crash in the middle of a write can leave a final line without its newline; drop it
+            end = size
+            while end > 0:
+                start = max(0, end - BLOCK_SIZE)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end != size:
+                f.truncate(end)
+
+            offset, count = self._read_checkpoint(f, end)
+            f.seek(offset)
+            while offset < end:
+                block = f.read(min(BLOCK_SIZE, end - offset))
+                count += block.count(b'\n')
+                offset += len(block)
+        self._size = end
+        self.count = count
+
+    def _read_checkpoint(self, f, end):
+        """(offset, count) from <log>.count if it matches the log, else (0, 0) to count from the start."""
+        try:
+            with open(self.path + '.count', 'rb') as checkpoint:
+                offset, count = CHECKPOINT.unpack(checkpoint.read(CHECKPOINT.size))
+        except (OSError, struct.error):
+            return 0, 0
+        # The checkpoint is written after the log is synced, so it may lag behind the log but never lead it
+        if offset > end or count > offset:
+            return 0, 0
+        if offset:
+            f.seek(offset - 1)
+            if f.read(1) != b'\n':
+                return 0, 0
+        return offset, count
+
+    def tail(self, n):
+        """Return the last n logged events as [(event_id, data), ...]."""
+        end, count = self._committed
+        if n <= 0 or not count:
+            return []
+        data = b''
+        start = end
+        with open(self.path, 'rb') as f:
+            # Read blocks backwards until they hold n complete lines
+            while start > 0 and data.count(b'\n') <= n:
+                step = min(BLOCK_SIZE, start)
+                start -= step
+                f.seek(start)
+                data = f.read(step) + data
+        lines = data.split(b'\n')[:-1]
+        if start > 0:
+            lines = lines[1:]  # starts mid-line
+        lines = lines[-n:]
+        return [(event_id, json.loads(line)) for event_id, line in enumerate(lines, start=count - len(lines) + 1)]
+
+    def submit(self, events):
+        commit = Commit(events)
+        self._queue.put(commit)
+        return commit
+
+    def write(self, events, timeout=None):
+        """Append events, wait for the group commit and return the ID of the first one."""
+        return self.submit(events).wait(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._checkpoint.close()
+
+    def _run(self):
+        running = True
+        while running:
+            commit = self._queue.get()
+            if commit is None:
+                break
+            pending = [commit]
+            size = len(commit.events)
+            while size < self.max_batch:
+                try:
+                    commit = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if commit is None:
+                    running = False
+                    break
+                pending.append(commit)
+                size += len(commit.events)
+
+            try:
+                self._commit(pending)
+            except Exception as error:
+                for commit in pending:
+                    commit.error = error
+            for commit in pending:
+                commit._done.set()
+
+    def _commit(self, pending):
+        records = []
+        count = self.count
+        for commit in pending:
+            commit.first_id = count + 1
+            records.extend(enumerate(commit.events, start=count + 1))
+            count += len(commit.events)
+        payload = ''.join(json.dumps(data, separators=(',', ':')) + '\n' for _, data in records).encode()
+        self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.count = count
+        self._size += len(payload)
+        self._committed = (self._size, count)
+        # Not fsync'd: a checkpoint lost in a crash only means counting a few more lines on the next start
+        self._checkpoint.seek(0)
+        self._checkpoint.write(CHECKPOINT.pack(self._size, count))
+        self._checkpoint.flush()
+
+        if self.on_commit and records:
+            try:
+                self.on_commit(records)
+            except Exception:
+                self.callback_errors += 1
+                logger.exception("on_commit failed for events %d-%d", records[0][0], records[-1][0])
@@ -0,0 +1,104 @@
+import threading
+from collections import namedtuple
+
+from markupsafe import escape
+
+# A stored webhook event with its wire formats rendered once, when it is ingested:
+# sse is the Server-Sent Events message and html the fragment shown on the index page (both bytes)
+Event = namedtuple('Event', 'id data sse html')
+
+
+def sse_frame(event_id, data):
+    """Format one webhook event as a Server-Sent Events message."""
+    return f"id: {event_id}\ndata: Event: {data['event']}, Details: {data['details']}, Timestamp: {data['timestamp']}\n\n"
+
+
+def html_fragment(data):
+    """Format one webhook event the way the index page shows it."""
+    return f"<div>New event: Event: {escape(data['event'])}, Details: {escape(data['details'])}, Timestamp: {escape(data['timestamp'])}</div>\n"
+
+
+def encode_event(event_id, data):
+    return Event(event_id, data, sse_frame(event_id, data).encode(), html_fragment(data).encode())
+
+
+class EventStore:
+    """
+    Fixed-capacity ring buffer of webhook events.
+    Every event gets a monotonically increasing ID; once the buffer is full the oldest event is overwritten,
+    so memory stays bounded however long the server runs. Safe to share between the threads of the Flask server.
+    Events are kept as Event records, so readers reuse the pre-rendered bytes instead of formatting per client.
+    """
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._appended = threading.Condition(self._lock)
+
+    @property
+    def last_id(self):
+        return self._next_id - 1
+
+    def append(self, data):
+        """Store data and return its event ID."""
+        with self._lock:
+            event_id = self._next_id
+            self._slots[event_id % self.capacity] = encode_event(event_id, data)
+            self._next_id += 1
+            self._appended.notify_all()
+            return event_id
+
+    def load(self, records):
+        """
+        Store [(event_id, data), ...] whose IDs were assigned elsewhere (e.g. by the event log), in increasing order.
+        Returns the stored Event records.
+        """
+        if not records:
+            return []
+        events = [encode_event(event_id, data) for event_id, data in records]
+        with self._lock:
+            for event in events:
+                self._slots[event.id % self.capacity] = event
+            self._next_id = events[-1].id + 1
+            self._appended.notify_all()
+        return events
+
+    def since(self, last_id=0):
+        """Return the Event records newer than last_id that are still in the buffer."""
+        with self._lock:
+            return self._since(last_id)
+
+    def _since(self, last_id):
+        first_id = max(last_id + 1, self._next_id - self.capacity, 1)
+        return [self._slots[event_id % self.capacity] for event_id in range(first_id, self._next_id)]
+
+    def resume_id(self, last_id):
+        """
+        The ID a stream should continue after, for a client's Last-Event-ID: None (no ID sent) starts with the next
+        new event; an ID ahead of the store (from before a restart with a different log) is stale, so the whole
+        buffer is replayed.
+        """
+        with self._lock:
+            if last_id is None:
+                return self._next_id - 1
+            return 0 if last_id > self._next_id - 1 else last_id
+
+    def wait_since(self, last_id=0, timeout=None):
+        """
+        Block until there are events newer than last_id (or timeout seconds pass) and return them.
+        A stale last_id, ahead of the store, returns the whole buffer at once instead of waiting for it to be reached.
+        """
+        with self._appended:
+            if last_id > self._next_id - 1:
+                last_id = 0
+            self._appended.wait_for(lambda: self._next_id - 1 > last_id, timeout)
+            return self._since(last_id)
+
+    def latest(self, n=None):
+        """Return the n most recent events (all buffered events if n is None), oldest first."""
+        n = self.capacity if n is None else min(n, self.capacity)
+        return self.since(self.last_id - n)
+
+    def __len__(self):
+        return min(self.last_id, self.capacity)
@@ -0,0 +1,258 @@
+import heapq
+import itertools
+import queue
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+from py_vapid import Vapid
+from pywebpush import WebPushException, WebPusher
+
+# Status codes from the push service that mean the subscription is gone for good
+EXPIRED_STATUS = (404, 410)
+# Vapid JWTs are valid for up to 24 h; sign for 12 h and renew an hour before expiry
+VAPID_TOKEN_LIFETIME = 12 * 60 * 60
+VAPID_TOKEN_RENEW_BEFORE = 60 * 60
+
+
+class PushMetrics:
+    def __init__(self, latency_samples=10_000):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=latency_samples)
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+        self.pruned = 0
+        self.dropped = 0
+        self.started = None
+
+    def record(self, outcome, latency=None, n=1):
+        with self._lock:
+            if self.started is None:
+                self.started = time.perf_counter()
+            setattr(self, outcome, getattr(self, outcome) + n)
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            elapsed = time.perf_counter() - self.started if self.started else 0
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else None
+
+        return {
+            'delivered': self.delivered,
+            'failed': self.failed,
+            'retried': self.retried,
+            'pruned': self.pruned,
+            'dropped': self.dropped,
+            'throughput_per_second': self.delivered / elapsed if elapsed else 0,
+            'latency_p50_ms': percentile(0.50),
+            'latency_p99_ms': percentile(0.99),
+        }
+
+
+class PushDispatcher:
+    """
+    Sends Web Push messages to many subscriptions at once.
+    - The VAPID key is loaded once, and the signed VAPID header is reused per push service until it nears expiry.
+    - Sends run on a bounded thread pool; each worker thread keeps its own keep-alive requests.Session.
+    - 429/5xx/connection errors are retried with exponential backoff (and Retry-After) through a delay queue.
+    - Subscriptions answered with 404/410 are pruned.
+    - dispatch() never blocks: messages go on a bounded intake queue (max_queued messages) that the dispatcher's own
+      thread fans out to the pool, so callers such as the event log writer are not held up by a slow push service.
+      A message arriving while the queue is full is dropped and counted (metrics 'dropped', per subscription).
+    """
+    def __init__(self, vapid_private_key="private_key.pem", vapid_claims=None, workers=16, max_pending=1024,
+                 max_attempts=4, backoff=0.5, ttl=0, timeout=10, on_expired=None, max_queued=10_000):
+        if isinstance(vapid_private_key, str):
+            vapid_private_key = Vapid.from_file(private_key_file=vapid_private_key)
+        self.vapid = vapid_private_key
+        self.vapid_claims = vapid_claims or {"sub": "mailto:you@example.com"}
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.ttl = ttl
+        self.timeout = timeout
+        self.on_expired = on_expired  # called with the endpoint of every pruned subscription
+        self.metrics = PushMetrics()
+        self.subscriptions = {}  # endpoint -> subscription_info
+
+        self._lock = threading.Lock()
+        self._vapid_headers = {}  # audience -> (expires, headers)
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._idle = threading.Condition(self._lock)
+        self._retries = []  # heap of (due, sequence, subscription_info, message, attempt)
+        self._sequence = itertools.count()
+        self._retry_ready = threading.Condition(threading.Lock())
+        self._closed = False
+        self._intake = queue.Queue(max_queued)
+        self._intake_thread = threading.Thread(target=self._intake_loop, daemon=True)
+        self._intake_thread.start()
+        threading.Thread(target=self._retry_loop, daemon=True).start()
+
+    def add_subscription(self, subscription_info):
+        with self._lock:
+            self.subscriptions[subscription_info['endpoint']] = subscription_info
+
+    def remove_subscription(self, endpoint):
+        with self._lock:
+            return self.subscriptions.pop(endpoint, None)
+
+    def dispatch(self, message, subscriptions=None):
+        """
+        Queue message for the given subscriptions (default: all registered ones) without blocking.
+        Returns the number of sends queued, 0 if the intake queue was full and the message was dropped.
+        """
+        if subscriptions is None:
+            with self._lock:
+                subscriptions = list(self.subscriptions.values())
+        else:
+            subscriptions = list(subscriptions)
+        if not subscriptions:
+            return 0
+        # Counts as pending until the intake thread has submitted every send, so join() waits for it
+        with self._lock:
+            self._pending += 1
+        try:
+            self._intake.put_nowait((message, subscriptions))
+        except queue.Full:
+            self.metrics.record('dropped', n=len(subscriptions))
+            self._done_pending()
+            return 0
+        return len(subscriptions)
+
+    def join(self, timeout=None):
+        """Wait until every queued send, including retries, has finished."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def close(self):
+        self._intake.put(None)
+        self._intake_thread.join()
+        self._closed = True
+        with self._retry_ready:
+            self._retry_ready.notify()
+        self._pool.shutdown(wait=True)
+
+    def _intake_loop(self):
+        while True:
+            item = self._intake.get()
+            if item is None:
+                return
+            message, subscriptions = item
+            try:
+                for subscription_info in subscriptions:
+                    self._submit(subscription_info, message, 1)  # waits for a free slot (max_pending)
+            finally:
+                self._done_pending()
+
+    def _submit(self, subscription_info, message, attempt):
+        self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        self._pool.submit(self._send, subscription_info, message, attempt)
+
+    def _finish(self):
+        self._slots.release()
+        self._done_pending()
+
+    def _done_pending(self):
+        with self._idle:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _headers_for(self, endpoint):
+        url = urlparse(endpoint)
+        audience = f"{url.scheme}://{url.netloc}"
+        now = time.time()
+        with self._lock:
+            cached = self._vapid_headers.get(audience)
+        if cached and cached[0] - VAPID_TOKEN_RENEW_BEFORE > now:
+            return cached[1]
+        expires = int(now) + VAPID_TOKEN_LIFETIME
+        headers = self.vapid.sign(dict(self.vapid_claims, aud=audience, exp=expires))
+        with self._lock:
+            self._vapid_headers[audience] = (expires, headers)
+        return headers
+
+    def send_now(self, subscription_info, message):
+        """
+        Send one message on the calling thread, without retries, and return the push service response.
+        Like pywebpush.webpush(), raises WebPushException (with .response) if the push service answers with status > 202.
+        """
+        response = WebPusher(subscription_info, requests_session=self._session()).send(
+            message, dict(self._headers_for(subscription_info['endpoint'])),
+            ttl=self.ttl, content_encoding="aes128gcm", timeout=self.timeout)
+        if response.status_code > 202:
+            raise WebPushException(f"Push failed: {response.status_code} {response.reason}", response=response)
+        return response
+
+    def _send(self, subscription_info, message, attempt):
+        time_start = time.perf_counter()
+        response = None
+        try:
+            response = self.send_now(subscription_info, message)
+        except WebPushException as ex:
+            response = ex.response
+        except requests.RequestException:
+            status = None
+        except Exception:
+            # Malformed subscription (bad keys etc.): retrying will not help
+            status = 400
+        retry_after = None
+        if response is not None:
+            status = response.status_code
+            retry_after = response.headers.get('Retry-After')
+        try:
+            if status is not None and status <= 202:
+                self.metrics.record('delivered', time.perf_counter() - time_start)
+            elif status in EXPIRED_STATUS:
+                self.remove_subscription(subscription_info['endpoint'])
+                if self.on_expired:
+                    self.on_expired(subscription_info['endpoint'])
+                self.metrics.record('pruned')
+            elif (status is None or status == 429 or status >= 500) and attempt < self.max_attempts:
+                self.metrics.record('retried')
+                self._schedule_retry(subscription_info, message, attempt + 1, retry_after)
+            else:
+                self.metrics.record('failed')
+        finally:
+            self._finish()
+
+    def _schedule_retry(self, subscription_info, message, attempt, retry_after=None):
+        delay = self.backoff * 2 ** (attempt - 2) * random.uniform(0.5, 1.5)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, int(retry_after))
+        # Counts as pending until the retry itself has run, so join() waits for it
+        with self._lock:
+            self._pending += 1
+        with self._retry_ready:
+            heapq.heappush(self._retries, (time.monotonic() + delay, next(self._sequence), subscription_info, message, attempt))
+            self._retry_ready.notify()
+
+    def _retry_loop(self):
+        while not self._closed:
+            with self._retry_ready:
+                while not self._closed and (not self._retries or self._retries[0][0] > time.monotonic()):
+                    self._retry_ready.wait(self._retries[0][0] - time.monotonic() if self._retries else None)
+                if self._closed:
+                    return
+                _, _, subscription_info, message, attempt = heapq.heappop(self._retries)
+            self._submit(subscription_info, message, attempt)
+            self._done_pending()
@@ -0,0 +1,95 @@
+"""
+Runs PushDispatcher against a local mock push service and prints delivery metrics.
+
+The mock service answers 201 after a short delay, 410 for endpoints under /gone/ (pruned),
+and 503 on the first attempt for endpoints under /flaky/ (retried).
+
+python push_load_test.py --subscriptions 2000 --workers 32
+"""
+import argparse
+import base64
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from py_vapid import Vapid
+
+if __package__:
+    from .push_dispatcher import PushDispatcher
+else:  # run as a script from this folder
+    from push_dispatcher import PushDispatcher
+
+
+class MockPushService(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+    delay = 0.005
+    seen = set()
+    seen_lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+        status = 201
+        if self.path.startswith('/gone/'):
+            status = 410
+        elif self.path.startswith('/flaky/'):
+            with self.seen_lock:
+                first = self.path not in self.seen
+                self.seen.add(self.path)
+            if first:
+                status = 503
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def make_subscription(endpoint):
+    public_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    p256dh = public_key.public_bytes(serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint)
+    return {"endpoint": endpoint, "keys": {"p256dh": b64url(p256dh), "auth": b64url(os.urandom(16))}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscriptions', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=32)
+    parser.add_argument('--port', type=int, default=5098)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), MockPushService)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    vapid = Vapid()
+    vapid.generate_keys()
+    dispatcher = PushDispatcher(vapid, workers=args.workers, backoff=0.05)
+    base = f"http://127.0.0.1:{args.port}"
+    for i in range(args.subscriptions):
+        kind = 'gone' if i % 50 == 0 else 'flaky' if i % 50 == 1 else 'ok'
+        dispatcher.add_subscription(make_subscription(f"{base}/{kind}/{i}"))
+
+    time_start = time.perf_counter()
+    dispatcher.dispatch(json.dumps({'event': 'zero-day vulnerability', 'details': 'load test'}))
+    dispatcher.join()
+    elapsed = time.perf_counter() - time_start
+    dispatcher.close()
+    server.shutdown()
+
+    metrics = dispatcher.metrics.snapshot()
+    print(f"Dispatched to {args.subscriptions} subscriptions in {elapsed:.2f} s with {args.workers} workers")
+    print(json.dumps(metrics, indent=4))
+    print(f"Subscriptions left after pruning: {len(dispatcher.subscriptions)}")
+
+
+if __name__ == '__main__':
+    main()
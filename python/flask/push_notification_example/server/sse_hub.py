@@ -0,0 +1,231 @@
+"""
+Async fan-out hub for Server-Sent Events.
+
+The Flask /stream endpoint ties up one server thread per connected client. The hub serves the same stream
+from a single asyncio event loop instead: the SSE frame rendered once at ingest (event_store.Event) is put on a small
+bounded queue per subscriber, and each connection is just a coroutine draining its queue.
+
+A subscriber whose queue is full is too slow to keep up; depending on slow_consumer it is either disconnected
+(the EventSource reconnects with Last-Event-ID and catches up from the EventStore) or the event is dropped for it.
+Idle connections get a ": heartbeat" comment every heartbeat_interval seconds from a single hub-wide timer.
+
+The hub can be served in two ways:
+- hub.asgi_app under an ASGI server, e.g. uvicorn
+- hub.start(port) runs a small built-in asyncio HTTP server in a background thread (no extra dependencies)
+
+publish() is thread-safe, so the Flask /webhook handler can call it directly.
+"""
+import asyncio
+import threading
+
+HEARTBEAT_FRAME = b": heartbeat\n\n"
+
+RESPONSE_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Connection: keep-alive\r\n"
+    b"\r\n"
+)
+NOT_FOUND = b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+class Subscriber:
+    __slots__ = ('queue', 'last_id', 'catching_up', 'closed', 'on_close')
+
+    def __init__(self, queue_size, last_id=0, on_close=None, catching_up=False):
+        self.queue = asyncio.Queue(queue_size)
+        self.last_id = last_id
+        # While True, frames() is replaying events from the EventStore and a full queue loses nothing
+        self.catching_up = catching_up
+        self.closed = False
+        self.on_close = on_close
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            # Wake frames() if it is waiting on an empty queue
+            if self.queue.empty():
+                self.queue.put_nowait((0, b""))
+            if self.on_close:
+                self.on_close()
+
+
+class SSEHub:
+    def __init__(self, store=None, queue_size=64, heartbeat_interval=15, slow_consumer='disconnect'):
+        if slow_consumer not in ('disconnect', 'drop'):
+            raise ValueError(f"Unsupported slow_consumer policy: {slow_consumer}")
+        self.store = store
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.slow_consumer = slow_consumer
+        self.subscribers = set()
+        self.loop = None
+        self.heartbeat_task = None
+        self.published = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+    def publish(self, event):
+        """Fan an Event out to every subscriber. Safe to call from any thread."""
+        event_id, frame = event.id, event.sse
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fan_out(event_id, frame)
+        else:
+            loop.call_soon_threadsafe(self._fan_out, event_id, frame)
+
+    def _fan_out(self, event_id, frame):
+        self.published += 1
+        for subscriber in tuple(self.subscribers):
+            try:
+                subscriber.queue.put_nowait((event_id, frame))
+            except asyncio.QueueFull:
+                if subscriber.catching_up:
+                    continue  # already in the store, frames() replays it from there
+                if self.slow_consumer == 'drop':
+                    self.dropped += 1
+                else:
+                    self.disconnected += 1
+                    self.unsubscribe(subscriber)
+                    subscriber.close()
+
+    def subscribe(self, last_id=None, on_close=None):
+        """
+        Register a subscriber (on the hub's loop) that starts with the buffered events newer than last_id, all of them
+        however many there are, as /stream. last_id None means new events only; a stale one replays the buffer
+        (EventStore.resume_id).
+        """
+        self.loop = self.loop or asyncio.get_running_loop()
+        if self.heartbeat_task is None:
+            self.heartbeat_task = self.loop.create_task(self._heartbeat())
+        if self.store is not None:
+            last_id = self.store.resume_id(last_id)
+        subscriber = Subscriber(self.queue_size, last_id or 0, on_close, catching_up=self.store is not None)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    async def _heartbeat(self):
+        # One timer for the whole hub rather than a timeout per connection
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            for subscriber in tuple(self.subscribers):
+                if subscriber.queue.empty():
+                    subscriber.queue.put_nowait((None, HEARTBEAT_FRAME))
+
+    async def frames(self, subscriber):
+        """Yield the bytes to send to one subscriber until it is closed."""
+        # The backlog comes straight from the store rather than through the bounded queue, so none of it is cut off.
+        # There is no await between finding nothing newer and catching_up = False, so no live event is missed.
+        while subscriber.catching_up and not subscriber.closed:
+            backlog = self.store.since(subscriber.last_id)
+            if not backlog:
+                subscriber.catching_up = False
+                break
+            for event in backlog:
+                if subscriber.closed:
+                    return
+                subscriber.last_id = event.id
+                yield event.sse
+        while not subscriber.closed:
+            event_id, frame = await subscriber.queue.get()
+            if event_id is None:
+                yield frame
+                continue
+            # An event can be both in the replayed backlog and fanned out live; send it once
+            if event_id <= subscriber.last_id:
+                continue
+            subscriber.last_id = event_id
+            yield frame
+
+    # Built-in asyncio HTTP server
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        lines = head.decode('latin-1').split("\r\n")
+        method, path = (lines[0].split(" ") + ["", ""])[:2]
+        if method != "GET" or path.split("?")[0] != "/stream":
+            writer.write(NOT_FOUND)
+            writer.close()
+            return
+        headers = dict(line.split(":", 1) for line in lines[1:] if ":" in line)
+        headers = {name.strip().lower(): value.strip() for name, value in headers.items()}
+
+        subscriber = self.subscribe(parse_last_event_id(headers.get('last-event-id')), on_close=writer.transport.abort)
+
+        async def wait_for_disconnect():
+            await reader.read()
+            subscriber.close()
+
+        watcher = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            writer.write(RESPONSE_HEADERS)
+            async for chunk in self.frames(subscriber):
+                writer.write(chunk)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            watcher.cancel()
+            self.unsubscribe(subscriber)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=5001, ready=None):
+        self.loop = asyncio.get_running_loop()
+        server = await asyncio.start_server(self._handle, host, port, backlog=4096)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    def start(self, host='127.0.0.1', port=5001):
+        """Run the built-in server on a daemon thread and return once it is listening."""
+        ready = threading.Event()
+        threading.Thread(target=asyncio.run, args=(self.serve(host, port, ready),), daemon=True).start()
+        ready.wait()
+
+    # ASGI
+
+    async def asgi_app(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != '/stream':
+            await send({'type': 'http.response.start', 'status': 404, 'headers': []})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        subscriber = self.subscribe(parse_last_event_id(headers.get('last-event-id')))
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            subscriber.close()
+
+        watcher = asyncio.ensure_future(wait_for_disconnect())
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache')]})
+            async for chunk in self.frames(subscriber):
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            watcher.cancel()
+            self.unsubscribe(subscriber)
+
+
+def parse_last_event_id(value):
+    """The integer value of a Last-Event-ID header, or None if it is absent or malformed."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
@@ -0,0 +1,118 @@
+"""
+Load test for the SSE hub (sse_hub.py).
+
+The hub runs in its own process so its memory can be measured on its own. This process opens N concurrent
+/stream connections, then the hub publishes M events, and the script reports how long fan-out took
+and how much hub memory each connection costs.
+
+python sse_load_test.py --connections 10000 --events 20
+"""
+import argparse
+import asyncio
+import multiprocessing
+import resource
+import time
+
+
+def read_rss_kb(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def raise_open_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def run_hub(port, number_of_events, go, done):
+    from event_store import encode_event
+    from sse_hub import SSEHub
+
+    raise_open_file_limit()
+    hub = SSEHub(queue_size=64, heartbeat_interval=15)
+    hub.start(port=port)
+    go.wait()
+    for event_id in range(1, number_of_events + 1):
+        hub.publish(encode_event(event_id, {'event': 'load test', 'details': 'x' * 64, 'timestamp': str(time.time())}))
+    done.wait()
+
+
+async def open_subscriber(port):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b"GET /stream HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n\r\n")
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+
+async def read_events(reader, number_of_events):
+    received = 0
+    while received < number_of_events:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.startswith(b"id: "):
+            received += 1
+    return received
+
+
+async def load_test(port, number_of_connections, number_of_events, hub_pid, go):
+    time_start = time.perf_counter()
+    connections = []
+    for start in range(0, number_of_connections, 500):
+        connections += await asyncio.gather(*(open_subscriber(port) for _ in range(start, min(start + 500, number_of_connections))))
+    time_connected = time.perf_counter()
+    await asyncio.sleep(0.5)
+    rss_connected = read_rss_kb(hub_pid)
+
+    readers = [asyncio.ensure_future(read_events(reader, number_of_events)) for reader, _ in connections]
+    time_publish = time.perf_counter()
+    go.set()
+    received = await asyncio.gather(*readers)
+    time_delivered = time.perf_counter()
+
+    for _, writer in connections:
+        writer.close()
+    return {
+        'connect_seconds': time_connected - time_start,
+        'deliver_seconds': time_delivered - time_publish,
+        'delivered': sum(received),
+        'rss_connected_kb': rss_connected,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--connections', type=int, default=10_000)
+    parser.add_argument('--events', type=int, default=20)
+    parser.add_argument('--port', type=int, default=5099)
+    args = parser.parse_args()
+
+    limit = raise_open_file_limit()
+    if limit < args.connections + 100:
+        print(f"Open file limit is {limit}; reduce --connections or raise ulimit -n")
+
+    go, done = multiprocessing.Event(), multiprocessing.Event()
+    hub = multiprocessing.Process(target=run_hub, args=(args.port, args.events, go, done), daemon=True)
+    hub.start()
+    time.sleep(1)
+    rss_idle = read_rss_kb(hub.pid)
+
+    result = asyncio.run(load_test(args.port, args.connections, args.events, hub.pid, go))
+    done.set()
+    hub.join(timeout=5)
+
+    expected = args.connections * args.events
+    per_connection = (result['rss_connected_kb'] - rss_idle) * 1024 / args.connections
+    print(f"Connections:       {args.connections} opened in {result['connect_seconds']:.2f} s")
+    print(f"Delivered:         {result['delivered']}/{expected} frames in {result['deliver_seconds']:.2f} s "
+          f"({result['delivered'] / result['deliver_seconds']:,.0f} frames/s)")
+    print(f"Hub RSS:           {rss_idle / 1024:.1f} MB idle, {result['rss_connected_kb'] / 1024:.1f} MB connected "
+          f"({per_connection / 1024:.1f} KB per connection)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import json
+import sqlite3
+import threading
+
+# Topic of subscriptions that want every event
+ALL_TOPICS = '*'
+
+
+class SubscriptionRegistry:
+    """
+    Push subscriptions, persisted in SQLite and indexed in memory by endpoint and by topic
+    (the "event" field of webhook payloads), so finding the subscribers of an event costs O(matches).
+    """
+    def __init__(self, path='subscriptions.sqlite3'):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS subscriptions (endpoint TEXT PRIMARY KEY, info TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS subscription_topics (
+                topic TEXT NOT NULL,
+                endpoint TEXT NOT NULL REFERENCES subscriptions(endpoint) ON DELETE CASCADE,
+                PRIMARY KEY (topic, endpoint)
+            );
+            CREATE INDEX IF NOT EXISTS subscription_topics_endpoint ON subscription_topics(endpoint);
+        """)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self.by_endpoint = {}  # endpoint -> (subscription_info, topics)
+        self.by_topic = {}  # topic -> set of endpoints
+        topics = {}
+        for endpoint, topic in self._db.execute("SELECT endpoint, topic FROM subscription_topics"):
+            topics.setdefault(endpoint, []).append(topic)
+        for endpoint, info in self._db.execute("SELECT endpoint, info FROM subscriptions"):
+            self._index(json.loads(info), topics.get(endpoint, [ALL_TOPICS]))
+
+    def _index(self, subscription_info, topics):
+        endpoint = subscription_info['endpoint']
+        self.by_endpoint[endpoint] = (subscription_info, tuple(topics))
+        for topic in topics:
+            self.by_topic.setdefault(topic, set()).add(endpoint)
+
+    def _unindex(self, endpoint):
+        entry = self.by_endpoint.pop(endpoint, None)
+        if entry is None:
+            return False
+        for topic in entry[1]:
+            endpoints = self.by_topic[topic]
+            endpoints.discard(endpoint)
+            if not endpoints:
+                del self.by_topic[topic]
+        return True
+
+    def subscribe(self, subscription_info, topics=None):
+        """Add or replace a subscription. topics=None subscribes to every event."""
+        if not isinstance(subscription_info, dict) or not subscription_info.get('endpoint') \
+                or not isinstance(subscription_info.get('keys'), dict):
+            raise ValueError("A subscription needs an endpoint and keys")
+        if topics is not None and (not isinstance(topics, list) or not all(isinstance(topic, str) for topic in topics)):
+            raise ValueError("topics must be a list of event names")
+        topics = sorted(set(topics)) if topics else [ALL_TOPICS]
+        endpoint = subscription_info['endpoint']
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM subscriptions WHERE endpoint = ?", (endpoint,))
+                self._db.execute("INSERT INTO subscriptions VALUES (?, ?)", (endpoint, json.dumps(subscription_info)))
+                self._db.executemany("INSERT INTO subscription_topics VALUES (?, ?)", [(topic, endpoint) for topic in topics])
+            self._unindex(endpoint)
+            self._index(subscription_info, topics)
+
+    def unsubscribe(self, endpoint):
+        """Remove a subscription; returns False if it was not registered."""
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM subscriptions WHERE endpoint = ?", (endpoint,))
+            return self._unindex(endpoint)
+
+    def get(self, endpoint):
+        entry = self.by_endpoint.get(endpoint)
+        return entry[0] if entry else None
+
+    def matching(self, topic):
+        """Return the subscription_info of every subscriber of topic (including subscribers of all topics)."""
+        with self._lock:
+            endpoints = self.by_topic.get(topic, set()) | self.by_topic.get(ALL_TOPICS, set())
+            return [self.by_endpoint[endpoint][0] for endpoint in endpoints]
+
+    def __len__(self):
+        return len(self.by_endpoint)
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,286 @@
+""" instrumentation.py
+Timers, counters and latency histograms for the hot paths of the scripts in this folder and the Flask server.
+
+Everything records into one process-wide Registry (REGISTRY). It is disabled unless INSTRUMENTATION=1 is set
+or REGISTRY.enable() is called; while disabled an instrumented function costs one attribute check per call.
+
+@instrumented('encrypt_file')            time every call into the histogram encrypt_file_seconds
+with REGISTRY.timer('x', endpoint='a'):  time a block
+REGISTRY.count('permits_issued')         increment the counter permits_issued_total
+REGISTRY.render()                        all metrics in the Prometheus text format
+
+SamplingProfiler is an opt-in profiler: a background thread samples the stacks of all threads every interval
+seconds and reports per function how often it was running (self) or on the stack (total), for a time window:
+print(profile(seconds=10))
+"""
+import bisect
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+
+# Upper bounds in seconds of the histogram buckets, 10 us to 10 s
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # the last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th fraction of observations (None if empty)."""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return None
+        rank = p * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else float('inf')
+        return float('inf')
+
+
+class Registry:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._counters = collections.defaultdict(int)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        # Histograms are zeroed in place, since instrumented functions keep a reference to theirs
+        with self._lock:
+            self._counters.clear()
+            for histogram in self._histograms.values():
+                with histogram._lock:
+                    histogram.counts = [0] * len(histogram.counts)
+                    histogram.sum = 0.0
+                    histogram.count = 0
+
+    def count(self, name, n=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += n
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        if self.enabled:
+            self.histogram(name, **labels).observe(seconds)
+
+    def timer(self, name, **labels):
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """{'counters': {...}, 'histograms': {...}} with label-qualified names, for JSON output."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = dict(self._histograms)
+        return {
+            'counters': {_qualified(name, labels): value for (name, labels), value in counters.items()},
+            'histograms': {
+                _qualified(name, labels): {
+                    'count': histogram.count,
+                    'sum_seconds': histogram.sum,
+                    'p50_seconds': histogram.percentile(0.50),
+                    'p99_seconds': histogram.percentile(0.99),
+                }
+                for (name, labels), histogram in histograms.items()
+            },
+        }
+
+    def render(self):
+        """Return every counter and histogram in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_labels(labels)} {value}")
+        for (name, labels), histogram in histograms:
+            metric = f"{name}_seconds"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            with histogram._lock:
+                counts, total, count = list(histogram.counts), histogram.sum, histogram.count
+            cumulative = 0
+            for bound, bucket in zip(histogram.bounds + ('+Inf',), counts):
+                cumulative += bucket
+                lines.append(f"{metric}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{_labels(labels)} {total:.9f}")
+            lines.append(f"{metric}_count{_labels(labels)} {count}")
+        return '\n'.join(lines) + '\n'
+
+
+class _Timer:
+    __slots__ = ('registry', 'name', 'labels', 'start')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _qualified(name, labels):
+    return name + _labels(labels)
+
+
+REGISTRY = Registry(enabled=os.environ.get('INSTRUMENTATION', '') not in ('', '0'))
+
+
+def instrumented(name, registry=REGISTRY):
+    """Decorator: record the duration of every call into the histogram <name>_seconds, and errors into <name>_errors_total."""
+    def decorate(func):
+        histogram = None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal histogram
+            if not registry.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException:
+                registry.count(f"{name}_errors")
+                raise
+            finally:
+                if histogram is None:
+                    histogram = registry.histogram(name)
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for a running process. Every interval seconds a background thread reads the current frame
+    of every other thread (sys._current_frames) and counts, per function, the samples where it was the running
+    function (self) and where it was anywhere on the stack (total). It measures wall clock time, so threads blocked
+    in a wait are counted too. Nothing runs outside start() .. stop(), so it can be switched on for a window in a live server.
+    """
+    def __init__(self, interval=0.005, ignore_threads=()):
+        self.interval = interval
+        self.ignore_threads = set(ignore_threads)
+        self.self_samples = collections.Counter()
+        self.total_samples = collections.Counter()
+        self.samples = 0
+        self.started = None
+        self.stopped = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self):
+        ignored = self.ignore_threads | {threading.get_ident()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id in ignored:
+                    continue
+                self.samples += 1
+                self.self_samples[_function_key(frame.f_code)] += 1
+                seen = set()
+                while frame is not None:
+                    key = _function_key(frame.f_code)
+                    if key not in seen:
+                        seen.add(key)
+                        self.total_samples[key] += 1
+                    frame = frame.f_back
+
+    def stats(self):
+        """[(function, self samples, total samples), ...] sorted by self, then total samples."""
+        stats = [(key, self.self_samples[key], count) for key, count in self.total_samples.items()]
+        return sorted(stats, key=lambda stat: (stat[1], stat[2]), reverse=True)
+
+    def report(self, top=30):
+        elapsed = (self.stopped or time.perf_counter()) - self.started
+        samples = max(self.samples, 1)
+        lines = [f"{self.samples} samples over {elapsed:.1f} s (every {self.interval * 1000:g} ms)",
+                 f"{'self %':>7} {'total %':>8}  function"]
+        for key, self_count, total_count in self.stats()[:top]:
+            lines.append(f"{100 * self_count / samples:>6.1f}% {100 * total_count / samples:>7.1f}%  {key}")
+        return '\n'.join(lines) + '\n'
+
+
+def _function_key(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def profile(seconds=10, interval=0.005, top=30):
+    """Sample all other threads of this process for seconds and return the per-function report."""
+    profiler = SamplingProfiler(interval, ignore_threads=[threading.get_ident()]).start()
+    time.sleep(seconds)
+    return profiler.stop().report(top)
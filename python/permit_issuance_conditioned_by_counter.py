@@ -19,80 +19,240 @@ apply_for_permit:
 
 This script models the permit issuance and management as described, ensuring the counters and reapplications are handled correctly.
 
+Permits are Permit records: a __slots__ object with an integer counter and a raw 32-byte signature, signed over a
+fixed binary layout. They become the JSON shape {"recipient", "counter", "signature" (hex)} only at the edges
+(to_json/from_json, printing). PermitTable keeps millions of permits in flat arrays.
+Permits signed before the binary layout (SHA-256 over the sorted JSON dict) verify only as issued: the JSON-era CA
+re-signed a used permit over the dict including its previous signature, which the permit no longer carries, so permits
+already used under the old scheme fail verification and have to be re-issued. A legacy permit that verifies is re-signed
+in the binary layout on its next use.
+
+Importing the module only defines CA, Permit, PermitTable and apply_for_permit; the simulation runs from the command line:
+python permit_issuance_conditioned_by_counter.py --max-accumulated 10 --counter 5 [--delay 1 3 | --no-delay]
 """
+import hmac
 import json
 import random
+import struct
+import sys
 import time
 import hashlib
-import sys
+from array import array
+
+if __package__:
+    from .instrumentation import REGISTRY, instrumented
+else:  # run as a script from this folder
+    from instrumentation import REGISTRY, instrumented
+
+# counter, signature, recipient length; followed by the UTF-8 recipient
+PERMIT_HEADER = struct.Struct('<q32sH')
+PERMIT_COUNTER = struct.Struct('<q')
+SIGNATURE_SIZE = 32
+
+
+class Permit:
+    __slots__ = ('recipient', 'counter', 'signature')
+
+    def __init__(self, recipient, counter, signature=b''):
+        self.recipient = recipient
+        self.counter = counter
+        self.signature = signature  # raw SHA-256 digest, b'' while unsigned
+
+    def signed_bytes(self):
+        """The bytes covered by the signature: the counter (int64) followed by the UTF-8 recipient."""
+        return PERMIT_COUNTER.pack(self.counter) + self.recipient.encode()
+
+    def to_bytes(self):
+        recipient = self.recipient.encode()
+        return PERMIT_HEADER.pack(self.counter, self.signature.ljust(SIGNATURE_SIZE, b'\0'), len(recipient)) + recipient
+
+    @classmethod
+    def from_bytes(cls, data):
+        counter, signature, length = PERMIT_HEADER.unpack_from(data)
+        recipient = bytes(data[PERMIT_HEADER.size:PERMIT_HEADER.size + length]).decode()
+        return cls(recipient, counter, b'' if signature == bytes(SIGNATURE_SIZE) else signature)
+
+    def to_json(self):
+        data = {'recipient': self.recipient, 'counter': self.counter}
+        if self.signature:
+            data['signature'] = self.signature.hex()
+        return data
+
+    @classmethod
+    def from_json(cls, data):
+        # Recipients repeat across permits; interning keeps one copy of each name
+        return cls(sys.intern(data['recipient']), int(data['counter']), bytes.fromhex(data.get('signature', '')))
+
+    def __eq__(self, other):
+        if not isinstance(other, Permit):
+            return NotImplemented
+        return (self.recipient, self.counter, self.signature) == (other.recipient, other.counter, other.signature)
+
+    def __repr__(self):
+        return f"Permit(recipient={self.recipient!r}, counter={self.counter}, signature={self.signature.hex()[:16]}...)"
+
+
+class PermitTable:
+    """
+    Column store for large numbers of live permits: per permit an int64 counter, a 32-byte signature and a uint32 index
+    into the list of distinct recipients, 44 bytes in total. Indexing returns a Permit; assigning a Permit updates the row.
+    """
+    def __init__(self, permits=()):
+        self.counters = array('q')
+        self.signatures = bytearray()
+        self.recipient_ids = array('I')
+        self.recipients = []
+        self._recipient_index = {}
+        for permit in permits:
+            self.append(permit)
+
+    def _recipient_id(self, recipient):
+        recipient_id = self._recipient_index.get(recipient)
+        if recipient_id is None:
+            recipient_id = self._recipient_index[recipient] = len(self.recipients)
+            self.recipients.append(recipient)
+        return recipient_id
+
+    def append(self, permit):
+        """Store permit and return its row index."""
+        self.counters.append(permit.counter)
+        self.signatures += permit.signature.ljust(SIGNATURE_SIZE, b'\0')
+        self.recipient_ids.append(self._recipient_id(permit.recipient))
+        return len(self.counters) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.counters)
+        signature = bytes(self.signatures[index * SIGNATURE_SIZE:(index + 1) * SIGNATURE_SIZE])
+        return Permit(self.recipients[self.recipient_ids[index]], self.counters[index], signature)
+
+    def __setitem__(self, index, permit):
+        if index < 0:
+            index += len(self.counters)
+        self.counters[index] = permit.counter
+        self.signatures[index * SIGNATURE_SIZE:(index + 1) * SIGNATURE_SIZE] = permit.signature.ljust(SIGNATURE_SIZE, b'\0')
+        self.recipient_ids[index] = self._recipient_id(permit.recipient)
+
+    def __len__(self):
+        return len(self.counters)
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
 
 class CA:
-    def __init__(self, max_accumulated):
+    def __init__(self, max_accumulated, delay=(1, 3)):
         self.internal_counter = 0
         self.max_accumulated = max_accumulated
+        # (min, max) seconds of simulated processing per use of a permit; None skips the delay
+        self.delay = delay
 
+    @instrumented('permit_sign')
     def sign_permit(self, permit):
+        """Sign a Permit in place and return it. A JSON-shaped dict is converted and returned as a new signed dict."""
+        if isinstance(permit, dict):
+            return self.sign_permit(Permit.from_json(permit)).to_json()
         # Simulate a digital signature with a hash for simplicity
-        permit_str = json.dumps(permit, sort_keys=True)
-        permit_hash = hashlib.sha256(permit_str.encode()).hexdigest()
-        permit['signature'] = permit_hash
+        permit.signature = hashlib.sha256(permit.signed_bytes()).digest()
         return permit
 
+    def verify_permit(self, permit):
+        if hmac.compare_digest(permit.signature, hashlib.sha256(permit.signed_bytes()).digest()):
+            return True
+        # Legacy signature of a freshly issued permit: the hash of its JSON dict before the signature was added
+        legacy = json.dumps({'recipient': permit.recipient, 'counter': permit.counter}, sort_keys=True)
+        return hmac.compare_digest(permit.signature, hashlib.sha256(legacy.encode()).digest())
+
     def issue_permit(self, recipient, counter):
         if self.internal_counter >= self.max_accumulated:
             print("CA has reached its maximum accumulated permits. Halting.")
-            exit()
+            REGISTRY.count('permits_refused')
+            return None
         else:
             print(f"CA has not reached its maximum accumulated permits of {self.max_accumulated}. Current counter: {self.internal_counter}")
 
 
-        permit = {
-            'recipient': recipient,
-            'counter': counter
-        }
-        signed_permit = self.sign_permit(permit)
+        signed_permit = self.sign_permit(Permit(recipient, counter))
         #self.internal_counter += 1
+        REGISTRY.count('permits_issued')
         return signed_permit
 
+    @instrumented('permit_validate_and_use')
     def validate_and_use_permit(self, permit):
-        if permit['counter'] <= 0:
+        """Use a Permit and return it re-signed, or False if rejected. A JSON-shaped dict is returned as a new dict."""
+        if isinstance(permit, dict):
+            signed_permit = self.validate_and_use_permit(Permit.from_json(permit))
+            return signed_permit.to_json() if signed_permit else signed_permit
+        if not self.verify_permit(permit):
+            print("Permit signature is invalid. Rejected.")
+            REGISTRY.count('permit_uses', outcome='invalid')
+            return False
+        if permit.counter <= 0:
             print("Permit counter has reached zero. Rejected.")
+            REGISTRY.count('permit_uses', outcome='rejected')
             return False
 
         # Simulate random delay
-        time.sleep(random.uniform(1, 3))
+        if self.delay:
+            time.sleep(random.uniform(*self.delay))
 
-        permit['counter'] -= 1
+        permit.counter -= 1
         self.internal_counter += 1
+        REGISTRY.count('permit_uses', outcome='accepted')
 
         signed_permit = self.sign_permit(permit)  # Re-sign the permit after modifying it
-        print(f"Permit accepted. Counter left: {signed_permit['counter']}")
-        print("Updated permit:", json.dumps(signed_permit, indent=4))
+        print(f"Permit accepted. Counter left: {signed_permit.counter}")
+        print("Updated permit:", json.dumps(signed_permit.to_json(), indent=4))
         return signed_permit
 
-# Initialize CA with a maximum accumulated value of 10
-ca = CA(max_accumulated=10)
-
 # Simulate entity A applying for a permit
-def apply_for_permit(entity, initial_counter):
-    permit = ca.issue_permit(entity, initial_counter)
-    if not permit:
-        return
-
-    while permit['counter'] > 0:
-        permit = ca.validate_and_use_permit(permit)
+def apply_for_permit(ca, entity, initial_counter):
+    """Use up permits until the CA reaches max_accumulated. Returns the number of permits issued."""
+    issued = 0
+    while True:
+        permit = ca.issue_permit(entity, initial_counter)
         if not permit:
-            break
+            return issued
+        issued += 1
 
-    if ca.internal_counter < ca.max_accumulated:
-        print("Permit counter reached zero. Applying for a new permit.")
-        apply_for_permit(entity, initial_counter)
-    else:
-        print("CA has halted further permit issuance.")
-        exit()
+        while permit.counter > 0:
+            permit = ca.validate_and_use_permit(permit)
+            if not permit:
+                break
 
-# Entity A applies for permits with an initial counter of 5
-apply_for_permit("A", 5)
+        if ca.internal_counter < ca.max_accumulated:
+            print("Permit counter reached zero. Applying for a new permit.")
+        else:
+            print("CA has halted further permit issuance.")
+            return issued
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulate permit issuance by a CA with a counter.")
+    parser.add_argument('--max-accumulated', type=int, default=10, help="Permit uses after which the CA halts")
+    parser.add_argument('--counter', type=int, default=5, help="Initial counter of every permit")
+    parser.add_argument('--entity', default="A")
+    parser.add_argument('--delay', type=float, nargs=2, default=(1, 3), metavar=('MIN', 'MAX'),
+                        help="Seconds of simulated processing per permit use")
+    parser.add_argument('--no-delay', action='store_true')
+    parser.add_argument('--metrics', action='store_true', help="Print timings and counters at the end")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        REGISTRY.enable()
+
+    # Initialize CA with a maximum accumulated value (10 by default)
+    ca = CA(max_accumulated=args.max_accumulated, delay=None if args.no_delay else args.delay)
+    # Entity A applies for permits with an initial counter (5 by default)
+    apply_for_permit(ca, args.entity, args.counter)
+
+    if args.metrics:
+        print(REGISTRY.render())
+
+
+if __name__ == '__main__':
+    main()
 
 """
 CA has not reached its maximum accumulated permits of 10. Current counter: 0
@@ -100,31 +260,31 @@ Permit accepted. Counter left: 4
 Updated permit: {
     "recipient": "A",
     "counter": 4,
-    "signature": "ca64f888012cadecbf1d234ee367fbbf73d2322f974ad48a16553b2addde505a"
+    "signature": "3fbab3c6cd6fb7596f98b649d319e2c708650f79adca72249214907276877546"
 }
 Permit accepted. Counter left: 3
 Updated permit: {
     "recipient": "A",
     "counter": 3,
-    "signature": "dc7050dc8179e9dc68e952ae29cb087e327555ce97f7ffc94be038a9ae14d55b"
+    "signature": "6e7bac1c6f1d369e0e1604c79a2ad0d8b15d7909881a9ca6336187b2c24693a3"
 }
 Permit accepted. Counter left: 2
 Updated permit: {
     "recipient": "A",
     "counter": 2,
-    "signature": "6f427c0563ae50710a8f4252b159bce2c945529265a7b9fb82a79750ed229ca9"
+    "signature": "346f631fc459d23d87d12d4ce84765abb435257f1fd54314523a82879c01bf20"
 }
 Permit accepted. Counter left: 1
 Updated permit: {
     "recipient": "A",
     "counter": 1,
-    "signature": "2c0b56f9c5b022f70823a3eafb748ea66cdaef1ce33b330ed0588688524b5327"
+    "signature": "0f32669d346065b1da465937a221d00801b2f572b01e395be6a8492bbb1f0467"
 }
 Permit accepted. Counter left: 0
 Updated permit: {
     "recipient": "A",
     "counter": 0,
-    "signature": "3018e4ec98c40a2517f7e2350aafcddb6cc7d82f3cf30bbb0ef7bbc2a2d9b45a"
+    "signature": "3f8a516d26ef5f7676cf166638c8f9b90f2372733c2977da654530c362bb4ddc"
 }
 Permit counter reached zero. Applying for a new permit.
 CA has not reached its maximum accumulated permits of 10. Current counter: 5
@@ -132,31 +292,31 @@ Permit accepted. Counter left: 4
 Updated permit: {
     "recipient": "A",
     "counter": 4,
-    "signature": "ca64f888012cadecbf1d234ee367fbbf73d2322f974ad48a16553b2addde505a"
+    "signature": "3fbab3c6cd6fb7596f98b649d319e2c708650f79adca72249214907276877546"
 }
 Permit accepted. Counter left: 3
 Updated permit: {
     "recipient": "A",
     "counter": 3,
-    "signature": "dc7050dc8179e9dc68e952ae29cb087e327555ce97f7ffc94be038a9ae14d55b"
+    "signature": "6e7bac1c6f1d369e0e1604c79a2ad0d8b15d7909881a9ca6336187b2c24693a3"
 }
 Permit accepted. Counter left: 2
 Updated permit: {
     "recipient": "A",
     "counter": 2,
-    "signature": "6f427c0563ae50710a8f4252b159bce2c945529265a7b9fb82a79750ed229ca9"
+    "signature": "346f631fc459d23d87d12d4ce84765abb435257f1fd54314523a82879c01bf20"
 }
 Permit accepted. Counter left: 1
 Updated permit: {
     "recipient": "A",
     "counter": 1,
-    "signature": "2c0b56f9c5b022f70823a3eafb748ea66cdaef1ce33b330ed0588688524b5327"
+    "signature": "0f32669d346065b1da465937a221d00801b2f572b01e395be6a8492bbb1f0467"
 }
 Permit accepted. Counter left: 0
 Updated permit: {
     "recipient": "A",
     "counter": 0,
-    "signature": "3018e4ec98c40a2517f7e2350aafcddb6cc7d82f3cf30bbb0ef7bbc2a2d9b45a"
+    "signature": "3f8a516d26ef5f7676cf166638c8f9b90f2372733c2977da654530c362bb4ddc"
 }
 CA has halted further permit issuance.
-"""
\ No newline at end of file
+"""
@@ -0,0 +1,300 @@
+""" recipient_mailbox.py
+Recipient side of secure_file_messaging_with_certs.py at mailbox scale: unwrap and decrypt many messages at once.
+
+A mailbox is a directory with a manifest, mailbox.jsonl, with one line per message:
+{"message_id": "m000001", "envelope_id": "e000001", "access_key": "<hex>", "file": "m000001.bin"}
+access_key is the content key wrapped for this recipient with RSA-OAEP (encrypt_symmetric_key), file the ciphered
+payload (IV + AES-CFB ciphertext, as encrypt_file writes it). Messages with the same envelope_id share one content key,
+e.g. the attachments of one message, or a message delivered again.
+message_id and file come from the sender: a name with a directory part (or '..') fails that message, so a manifest
+cannot read or write outside the mailbox and output directories.
+
+MailboxService.drain decrypts every message of a mailbox into an output directory:
+- RSA-OAEP unwraps run on a process pool. Each worker process loads (and decrypts) the private key PEM once, in the
+  pool initializer, and unwraps batches of keys per task, so neither the key loading nor the IPC is paid per message.
+- Content keys are cached in a bounded LRU, so repeated envelopes and later drains skip the RSA operation. The cache is
+  keyed by envelope ID and a SHA-256 of the wrapped key: envelope IDs are chosen by senders, so the same ID in another
+  mailbox (or from another sender) must not get this envelope's content key.
+- Payloads are stream-decrypted to disk (decrypt_file_stream) on a thread pool as soon as their key is unwrapped,
+  overlapping the unwraps of the next batches.
+The drain returns a report with the throughput in messages/s; drain_serial is the one-message-at-a-time baseline.
+
+python recipient_mailbox.py --messages 2000 --payload-size 16384 --workers 4
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+
+if __package__:
+    from .instrumentation import REGISTRY
+    from .secure_file_messaging_with_certs import (
+        CertificateAuthority, ChainValidator, create_key_pair, decrypt_file, decrypt_file_stream, decrypt_symmetric_key,
+        encrypt_file_stream, encrypt_symmetric_key, save_key_and_cert,
+    )
+else:  # run as a script from this folder
+    from instrumentation import REGISTRY
+    from secure_file_messaging_with_certs import (
+        CertificateAuthority, ChainValidator, create_key_pair, decrypt_file, decrypt_file_stream, decrypt_symmetric_key,
+        encrypt_file_stream, encrypt_symmetric_key, save_key_and_cert,
+    )
+
+MANIFEST = "mailbox.jsonl"
+
+# Private key of a worker process, loaded once by _load_private_key
+_worker_key = None
+
+
+def _load_private_key(key_path, password):
+    global _worker_key
+    with open(key_path, 'rb') as key_file:
+        _worker_key = serialization.load_pem_private_key(key_file.read(), password=password, backend=default_backend())
+
+
+def _unwrap_batch(batch):
+    """[(cache_key, ciphered_key), ...] -> [(cache_key, symmetric key, or None if it was not wrapped for this key)]"""
+    results = []
+    for cache_key, ciphered_key in batch:
+        try:
+            results.append((cache_key, decrypt_symmetric_key(ciphered_key, _worker_key)))
+        except ValueError:
+            results.append((cache_key, None))
+    return results
+
+
+def _cache_key(envelope_id, access_key):
+    return envelope_id, hashlib.sha256(access_key).digest()
+
+
+def _manifest_path(directory, name):
+    """directory/name for a file name taken from the manifest; names with a directory part (or '..') are rejected."""
+    if not isinstance(name, str) or name in ('', '.', '..') or os.path.basename(name) != name:
+        raise ValueError(f"Invalid file name in the mailbox manifest: {name!r}")
+    return os.path.join(directory, name)
+
+
+def read_manifest(mailbox_dir):
+    with open(os.path.join(mailbox_dir, MANIFEST)) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class MailboxService:
+    def __init__(self, key_path, password=None, workers=None, decrypt_threads=4, cache_size=10_000, batch_size=64,
+                 chunk_size=1 << 20):
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self._keys = OrderedDict()  # (envelope_id, SHA-256 of the access key) -> content key, least recently used first
+        self._lock = threading.Lock()
+        self._unwrap_pool = ProcessPoolExecutor(max_workers=workers, initializer=_load_private_key,
+                                                initargs=(key_path, password))
+        self._decrypt_pool = ThreadPoolExecutor(decrypt_threads)
+
+    def close(self):
+        self._unwrap_pool.shutdown(wait=True)
+        self._decrypt_pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def cached_key(self, envelope_id, access_key):
+        """Content key of the envelope if access_key (the wrapped key, bytes) was unwrapped before, else None."""
+        return self._cached(_cache_key(envelope_id, access_key))
+
+    def _cached(self, cache_key):
+        with self._lock:
+            key = self._keys.get(cache_key)
+            if key is not None:
+                self._keys.move_to_end(cache_key)
+            return key
+
+    def _remember(self, cache_key, key):
+        with self._lock:
+            self._keys[cache_key] = key
+            self._keys.move_to_end(cache_key)
+            while len(self._keys) > self.cache_size:
+                self._keys.popitem(last=False)
+
+    def _decrypt(self, mailbox_dir, out_dir, message, key):
+        return decrypt_file_stream(_manifest_path(mailbox_dir, message['file']),
+                                   _manifest_path(out_dir, message['message_id']), key, self.chunk_size)
+
+    def drain(self, mailbox_dir, out_dir):
+        """Decrypt every message of mailbox_dir into out_dir/<message_id>; returns a report (see MailboxService)."""
+        os.makedirs(out_dir, exist_ok=True)
+        time_start = time.perf_counter()
+        messages = read_manifest(mailbox_dir)
+
+        waiting = OrderedDict()  # cache key -> (access key, messages waiting for its content key)
+        decrypts = []
+        cache_hits = 0
+        for message in messages:
+            access_key = bytes.fromhex(message['access_key'])
+            cache_key = _cache_key(message['envelope_id'], access_key)
+            key = self._cached(cache_key)
+            if key is not None:
+                cache_hits += 1
+                decrypts.append(self._decrypt_pool.submit(self._decrypt, mailbox_dir, out_dir, message, key))
+            else:
+                waiting.setdefault(cache_key, (access_key, []))[1].append(message)
+
+        # One unwrap per envelope and access key
+        unwraps = [(cache_key, access_key) for cache_key, (access_key, _) in waiting.items()]
+        batches = [self._unwrap_pool.submit(_unwrap_batch, unwraps[i:i + self.batch_size])
+                   for i in range(0, len(unwraps), self.batch_size)]
+        failed = 0
+        for batch in as_completed(batches):
+            for cache_key, key in batch.result():
+                waiting_messages = waiting[cache_key][1]
+                if key is None:
+                    failed += len(waiting_messages)
+                    continue
+                self._remember(cache_key, key)
+                for message in waiting_messages:
+                    decrypts.append(self._decrypt_pool.submit(self._decrypt, mailbox_dir, out_dir, message, key))
+
+        size = 0
+        for decrypt in decrypts:
+            try:
+                size += decrypt.result()
+            except (OSError, ValueError):
+                failed += 1
+        seconds = time.perf_counter() - time_start
+
+        REGISTRY.count('mailbox_messages', len(messages) - failed, outcome='decrypted')
+        REGISTRY.count('mailbox_messages', failed, outcome='failed')
+        REGISTRY.count('mailbox_key_cache', cache_hits, result='hit')
+        REGISTRY.count('mailbox_key_cache', len(unwraps), result='miss')
+        return _report(len(messages), len(messages) - failed, failed, len(unwraps), cache_hits, size, seconds)
+
+
+def drain_serial(mailbox_dir, out_dir, private_key):
+    """Baseline: for every message, unwrap its key, decrypt the whole payload in memory and write it."""
+    os.makedirs(out_dir, exist_ok=True)
+    time_start = time.perf_counter()
+    messages = read_manifest(mailbox_dir)
+    size = 0
+    for message in messages:
+        key = decrypt_symmetric_key(bytes.fromhex(message['access_key']), private_key)
+        with open(_manifest_path(mailbox_dir, message['file']), 'rb') as f:
+            plaintext = decrypt_file(f.read(), key)
+        with open(_manifest_path(out_dir, message['message_id']), 'wb') as f:
+            f.write(plaintext)
+        size += len(plaintext)
+    return _report(len(messages), len(messages), 0, len(messages), 0, size, time.perf_counter() - time_start)
+
+
+def _report(messages, decrypted, failed, unwrapped, cache_hits, size, seconds):
+    return {
+        'messages': messages,
+        'decrypted': decrypted,
+        'failed': failed,
+        'unwrapped_keys': unwrapped,
+        'key_cache_hits': cache_hits,
+        'bytes': size,
+        'seconds': seconds,
+        'messages_per_second': messages / seconds if seconds else 0.0,
+        'mb_per_second': size / seconds / (1 << 20) if seconds else 0.0,
+    }
+
+
+def create_mailbox(mailbox_dir, public_key, number_of_messages, payload_size, messages_per_envelope=1):
+    """Sender side: write number_of_messages random payloads, encrypted for public_key, into a new mailbox."""
+    os.makedirs(mailbox_dir, exist_ok=True)
+    plaintext_path = os.path.join(mailbox_dir, "plaintext.tmp")
+    with open(os.path.join(mailbox_dir, MANIFEST), 'w') as manifest:
+        for i in range(number_of_messages):
+            if i % messages_per_envelope == 0:
+                envelope_id = f"e{i // messages_per_envelope:06d}"
+                symmetric_key = os.urandom(32)  # AES-256 key
+                access_key = encrypt_symmetric_key(symmetric_key, public_key).hex()
+            message_id = f"m{i:06d}"
+            with open(plaintext_path, 'wb') as f:
+                f.write(os.urandom(payload_size))
+            encrypt_file_stream(plaintext_path, os.path.join(mailbox_dir, f"{message_id}.bin"), symmetric_key)
+            manifest.write(json.dumps({'message_id': message_id, 'envelope_id': envelope_id,
+                                       'access_key': access_key, 'file': f"{message_id}.bin"}) + '\n')
+    os.remove(plaintext_path)
+
+
+def print_report(name, report):
+    print(f"{name:>14}: {report['decrypted']}/{report['messages']} messages in {report['seconds']:.2f} s, "
+          f"{report['messages_per_second']:,.0f} messages/s, {report['mb_per_second']:.1f} MB/s "
+          f"({report['unwrapped_keys']} keys unwrapped, {report['key_cache_hits']} from cache, {report['failed']} failed)")
+
+
+# Usage
+def demo_mailbox(work_dir="mailbox_demo", number_of_messages=2000, payload_size=16 << 10, messages_per_envelope=1,
+                 workers=None, decrypt_threads=4, cache_size=10_000):
+    mailbox_dir = os.path.join(work_dir, "mailbox")
+    out_dir = os.path.join(work_dir, "decrypted")
+    key_path = os.path.join(work_dir, "recipient_private_key.pem")
+    cert_path = os.path.join(work_dir, "recipient_cert.pem")
+    password = b"your_password"
+    os.makedirs(work_dir, exist_ok=True)
+
+    # The recipient's certificate is issued by a CA; the sender validates it before wrapping keys for it
+    ca = CertificateAuthority.root().intermediate("Users CA")
+    key = create_key_pair()
+    cert = ca.issue(key, "Recipient", "Recipient")
+    save_key_and_cert(key, cert, key_path, cert_path, password=password)
+    validator = ChainValidator([ca.root_certificate()], ca.chain())
+    create_mailbox(mailbox_dir, validator.validate(cert).public_key(), number_of_messages, payload_size,
+                   messages_per_envelope)
+
+    print_report("serial", drain_serial(mailbox_dir, out_dir, key))
+    with MailboxService(key_path, password, workers, decrypt_threads, cache_size) as service:
+        print_report("service", service.drain(mailbox_dir, out_dir))
+        # Same mailbox again: every content key comes from the LRU cache
+        print_report("service again", service.drain(mailbox_dir, out_dir))
+
+    for path in (mailbox_dir, out_dir):
+        shutil.rmtree(path)
+    for path in (key_path, cert_path):
+        os.remove(path)
+    if not os.listdir(work_dir):
+        os.rmdir(work_dir)
+
+"""
+On one CPU core, where the unwrap pool has a single worker; with more cores the first service drain scales with --workers:
+        serial: 2000/2000 messages in 1.46 s, 1,367 messages/s, 21.4 MB/s (2000 keys unwrapped, 0 from cache, 0 failed)
+       service: 2000/2000 messages in 1.13 s, 1,765 messages/s, 27.6 MB/s (2000 keys unwrapped, 0 from cache, 0 failed)
+ service again: 2000/2000 messages in 0.26 s, 7,785 messages/s, 121.6 MB/s (0 keys unwrapped, 2000 from cache, 0 failed)
+With --messages-per-envelope 4 the service unwraps 500 keys: 4,170 messages/s on the first drain.
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Decrypt a mailbox of messages with a process pool of RSA unwrappers.")
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--payload-size', type=int, default=16 << 10, help="Bytes per message")
+    parser.add_argument('--messages-per-envelope', type=int, default=1, help="Messages sharing one content key")
+    parser.add_argument('--workers', type=int, default=None, help="Unwrap processes (default: one per CPU)")
+    parser.add_argument('--threads', type=int, default=4, help="Decrypt threads")
+    parser.add_argument('--cache-size', type=int, default=10_000, help="Content keys kept in the LRU cache")
+    parser.add_argument('--work-dir', default="mailbox_demo", help="Directory for the mailbox, its key and the decrypted files, all removed at the end")
+    parser.add_argument('--metrics', action='store_true', help="Print timings and counters at the end")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        REGISTRY.enable()
+
+    demo_mailbox(args.work_dir, args.messages, args.payload_size, args.messages_per_envelope, args.workers,
+                 args.threads, args.cache_size)
+
+    if args.metrics:
+        print(REGISTRY.render())
+
+
+if __name__ == '__main__':
+    main()
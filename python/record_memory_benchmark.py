@@ -0,0 +1,79 @@
+""" record_memory_benchmark.py
+Per-record memory of live permits and tokens: JSON-shaped dicts (as parsed from JSON) against the Permit/Token
+__slots__ records and the PermitTable/TokenTable column stores. Records are parsed from the same JSON lines as the dicts,
+so strings they keep are counted too. Measured with tracemalloc: only the Python heap counts.
+
+python record_memory_benchmark.py --records 1000000
+"""
+import argparse
+import gc
+import json
+import random
+import tracemalloc
+
+if __package__:
+    from .data_token import Token, TokenTable, create_json_with_dictionary
+    from .permit_issuance_conditioned_by_counter import CA, Permit, PermitTable
+else:  # run as a script from this folder
+    from data_token import Token, TokenTable, create_json_with_dictionary
+    from permit_issuance_conditioned_by_counter import CA, Permit, PermitTable
+
+
+def measure(build):
+    """Return (object, bytes allocated while building it and still held)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    value = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, after - before
+
+
+def permit_lines(number_of_records, recipients=1000):
+    ca = CA(max_accumulated=0, delay=None)
+    for i in range(number_of_records):
+        yield json.dumps(ca.sign_permit({'recipient': f"entity-{i % recipients}", 'counter': random.randint(0, 5)}))
+
+
+def token_lines(number_of_records):
+    for i in range(number_of_records):
+        yield create_json_with_dictionary({
+            'event': 'example_event',
+            'details': 'This is an example data dictionary.',
+            'time_start': "2023-09-01_0000_00",
+            'time_end': "2024-09-01_0000_00",
+        })
+
+
+def report(kind, number_of_records, results):
+    baseline = results[0][1]
+    for name, size in results:
+        print(f"{kind:7} {name:12} {size / number_of_records:>8.1f} bytes/record   {baseline / size:>5.1f}x smaller")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=100_000)
+    args = parser.parse_args()
+    n = args.records
+
+    lines = list(permit_lines(n))
+    dicts, dict_size = measure(lambda: [json.loads(line) for line in lines])
+    records, record_size = measure(lambda: [Permit.from_json(json.loads(line)) for line in lines])
+    table, table_size = measure(lambda: PermitTable(records))
+    assert table[n - 1] == records[n - 1] and records[0].to_json() == dicts[0]
+    report('Permit', n, [('dict', dict_size), ('Permit', record_size), ('PermitTable', table_size)])
+    del lines, dicts, records, table
+
+    lines = list(token_lines(n))
+    dicts, dict_size = measure(lambda: [json.loads(line) for line in lines])
+    records, record_size = measure(lambda: [Token.from_json(json.loads(line)) for line in lines])
+    table, table_size = measure(lambda: TokenTable(records))
+    assert table[n - 1] == records[n - 1] and records[0].to_json() == dicts[0]
+    report('Token', n, [('dict', dict_size), ('Token', record_size), ('TokenTable', table_size)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+""" test_recipient_mailbox.py
+python -m pytest test_recipient_mailbox.py
+"""
+import json
+import os
+
+import pytest
+
+from .recipient_mailbox import MANIFEST, MailboxService, create_mailbox, drain_serial
+from .secure_file_messaging_with_certs import CertificateAuthority, create_key_pair, save_key_and_cert
+
+
+def read_outputs(out_dir):
+    outputs = {}
+    for name in sorted(os.listdir(out_dir)):
+        with open(os.path.join(out_dir, name), 'rb') as f:
+            outputs[name] = f.read()
+    return outputs
+
+
+def test_drain_mailboxes_with_colliding_envelope_ids(tmp_path):
+    key = create_key_pair()
+    key_path = str(tmp_path / "recipient_private_key.pem")
+    save_key_and_cert(key, CertificateAuthority.root().issue(key, "Recipient", "Recipient"), key_path,
+                      str(tmp_path / "recipient_cert.pem"), password=b"password")
+
+    # Both mailboxes number their envelopes from e000000, each with its own content keys
+    mailboxes = [str(tmp_path / name) for name in ("first", "second")]
+    for mailbox_dir in mailboxes:
+        create_mailbox(mailbox_dir, key.public_key(), number_of_messages=6, payload_size=1000, messages_per_envelope=2)
+
+    with MailboxService(key_path, b"password", workers=1, decrypt_threads=2) as service:
+        for mailbox_dir in mailboxes:
+            report = service.drain(mailbox_dir, mailbox_dir + "-out")
+            assert report['decrypted'] == 6
+            assert report['unwrapped_keys'] == 3
+            assert report['key_cache_hits'] == 0
+
+            drain_serial(mailbox_dir, mailbox_dir + "-expected", key)
+            assert read_outputs(mailbox_dir + "-out") == read_outputs(mailbox_dir + "-expected")
+
+        # Draining the first mailbox again takes its own keys from the cache
+        report = service.drain(mailboxes[0], mailboxes[0] + "-again")
+        assert report['key_cache_hits'] == 6
+        assert read_outputs(mailboxes[0] + "-again") == read_outputs(mailboxes[0] + "-expected")
+
+
+def test_drain_rejects_message_ids_outside_out_dir(tmp_path):
+    key = create_key_pair()
+    key_path = str(tmp_path / "recipient_private_key.pem")
+    save_key_and_cert(key, CertificateAuthority.root().issue(key, "Recipient", "Recipient"), key_path,
+                      str(tmp_path / "recipient_cert.pem"), password=b"password")
+    mailbox_dir = str(tmp_path / "mailbox")
+    create_mailbox(mailbox_dir, key.public_key(), number_of_messages=4, payload_size=100)
+
+    # Rewrite the manifest as a hostile sender could: message IDs that escape the output directory
+    manifest_path = os.path.join(mailbox_dir, MANIFEST)
+    with open(manifest_path) as f:
+        messages = [json.loads(line) for line in f]
+    escape = str(tmp_path / "escaped")
+    for message, message_id in zip(messages, ("../escaped", escape, "..", "")):
+        message['message_id'] = message_id
+    with open(manifest_path, 'w') as f:
+        f.writelines(json.dumps(message) + '\n' for message in messages)
+
+    out_dir = str(tmp_path / "out")
+    with MailboxService(key_path, b"password", workers=1) as service:
+        report = service.drain(mailbox_dir, out_dir)
+    assert report['decrypted'] == 0 and report['failed'] == 4
+    assert os.listdir(out_dir) == [] and not os.path.exists(escape)
+
+    with pytest.raises(ValueError):
+        drain_serial(mailbox_dir, out_dir, key)
+    assert not os.path.exists(escape)